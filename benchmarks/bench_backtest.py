@@ -0,0 +1,119 @@
+"""
+Time the vectorised backtest on synthetic random-walk bars and check its
+fills against a bar-by-bar loop that calls generate_gtt_plan itself.
+
+    python -m benchmarks.bench_backtest --symbols 500 2000 --bars 2500
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from core.backtest import gtt_fills, run_backtest
+from core.gtt_logic import generate_gtt_plan
+from core.gtt_menu import read_csv
+from benchmarks.bench_gtt_plans import _StaticHoldings, _StaticQuotes
+
+
+def make_bars(symbols, bars, seed=13):
+    """Daily OHLC random walks (N, T) plus an entry_levels sheet a little below the start prices."""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(20, 4000, (symbols, 1))
+    returns = rng.normal(0.0003, 0.02, (symbols, bars))
+    close = np.round(start * np.exp(np.cumsum(returns, axis=1)), 2)
+    open_ = np.round(np.hstack([start, close[:, :-1]]) * (1 + rng.normal(0, 0.004, (symbols, bars))), 2)
+    spread = np.abs(rng.normal(0, 0.012, (symbols, bars)))
+    high = np.round(np.maximum(open_, close) * (1 + spread), 2)
+    low = np.round(np.minimum(open_, close) * (1 - spread), 2)
+    # A few symbols list late or halt for a while
+    gaps = rng.random((symbols, bars)) < 0.002
+    for grid in (open_, high, low, close):
+        grid[gaps] = np.nan
+
+    price = start[:, 0]
+    entry1 = np.round(price * rng.uniform(0.9, 1.05, symbols), 2)
+    entry2 = np.round(entry1 * rng.uniform(0.8, 0.95, symbols), 2)
+    entry3 = np.round(entry2 * rng.uniform(0.8, 0.95, symbols), 2)
+    entry2[rng.random(symbols) < 0.15] = np.nan
+    entry3[rng.random(symbols) < 0.25] = np.nan
+    names = [f"SYM{i:05d}" for i in range(symbols)]
+    entry_levels = pd.DataFrame({
+        "symbol": names,
+        "exchange": "NSE",
+        "entry1": entry1,
+        "entry2": entry2,
+        "entry3": entry3,
+        "Allocated": rng.choice([10000, 25000, 50000, 100000], symbols),
+    })
+    times = pd.bdate_range("2015-01-01", periods=bars)
+    return entry_levels, names, times, {"open": open_, "high": high, "low": low, "close": close}
+
+
+def run_loop(scrips, symbols, times, grids):
+    """The strategy the slow way: plan every symbol at every bar, then check the bar."""
+    rows = {s: i for i, s in enumerate(symbols)}
+    held = {s: 0 for s in symbols}
+    last_close = {}
+    fills = []
+    for t in range(len(times)):
+        quotes = _StaticQuotes(dict(last_close))
+        holdings = _StaticHoldings(held)
+        for scrip in scrips:
+            symbol = scrip["symbol"]
+            row = rows[symbol]
+            if symbol in last_close:
+                for plan in generate_gtt_plan(None, scrip, quotes, holdings):
+                    if plan["qty"] <= 0:
+                        continue
+                    bar = [grids[col][row, t] for col in ("open", "high", "low")]
+                    filled, price = gtt_fills(plan["price"], plan["trigger"], quotes.get_cmp("NSE", symbol), *bar)
+                    if filled:
+                        fills.append((symbol, times[t], plan["entry"], plan["qty"], float(price)))
+                        held[symbol] += plan["qty"]
+            close = grids["close"][row, t]
+            if not np.isnan(close):
+                last_close[symbol] = float(close)
+    return fills
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[200, 1000, 3000])
+    parser.add_argument("--bars", type=int, default=2500, help="bars per symbol (2500 is ~10 years daily)")
+    parser.add_argument("--check-symbols", type=int, default=100, help="symbols replayed by the loop for the Match column")
+    parser.add_argument("--check-bars", type=int, default=500)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    entry_levels, symbols, times, grids = make_bars(args.check_symbols, args.check_bars)
+    # Both sides read entry levels from a CSV, blank cells and all
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "entry_levels.csv")
+        entry_levels.to_csv(path, index=False)
+        scrips = read_csv(path)
+        entry_levels = pd.read_csv(path)
+    start = time.perf_counter()
+    expected = run_loop(scrips, symbols, times, grids)
+    loop_s = time.perf_counter() - start
+    start = time.perf_counter()
+    _, fills, _ = run_backtest(entry_levels, symbols, times, grids)
+    vector_s = time.perf_counter() - start
+    got = sorted(zip(fills["symbol"], fills["trade_date"], fills["entry"], fills["quantity"], fills["price"]))
+    match = got == sorted(expected)
+    print(f"Check: {args.check_symbols} symbols x {args.check_bars} bars, loop {loop_s:.2f}s, "
+          f"vectorised {vector_s:.3f}s, {len(expected)} fills, Match {match}")
+
+    print(f"\n{'Symbols':>8} {'Bars':>6} {'Cells (M)':>10} {'Time (s)':>9} {'Fills':>7} {'ROI%':>8}")
+    for n in args.symbols:
+        entry_levels, symbols, times, grids = make_bars(n, args.bars)
+        start = time.perf_counter()
+        _, fills, summary = run_backtest(entry_levels, symbols, times, grids)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>8} {args.bars:>6} {n * args.bars / 1e6:>10.2f} {elapsed:>9.2f} {len(fills):>7} "
+              f"{summary['roi_pct']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
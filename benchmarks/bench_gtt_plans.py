@@ -0,0 +1,96 @@
+"""
+Compare generate_gtt_plan (one scrip at a time) with the batch
+generate_gtt_plans over a synthetic entry_levels sheet.
+
+    python -m benchmarks.bench_gtt_plans --rows 1000 10000 50000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from core.gtt_logic import generate_gtt_plan, generate_gtt_plans
+from core.gtt_menu import read_csv
+
+
+class _StaticQuotes:
+    def __init__(self, ltp_by_symbol):
+        self.ltp_by_symbol = ltp_by_symbol
+
+    def get_cmp(self, exchange, symbol):
+        return self.ltp_by_symbol.get(symbol)
+
+
+class _StaticHoldings:
+    def __init__(self, qty_by_symbol):
+        self.qty_by_symbol = qty_by_symbol
+
+    def held_qty(self, symbol):
+        return self.qty_by_symbol.get(symbol, 0)
+
+
+def make_sheet(rows, seed=7):
+    rng = np.random.default_rng(seed)
+    ltp = np.round(rng.uniform(5, 5000, rows), 2)
+    entry1 = np.round(ltp * rng.uniform(0.85, 1.05, rows), 2)
+    entry2 = np.round(entry1 * rng.uniform(0.85, 0.98, rows), 2)
+    entry3 = np.round(entry2 * rng.uniform(0.85, 0.98, rows), 2)
+    # Knock out some levels so every quantity-split branch is exercised
+    entry2[rng.random(rows) < 0.15] = np.nan
+    entry3[rng.random(rows) < 0.25] = np.nan
+    entry1[rng.random(rows) < 0.05] = np.nan
+    df = pd.DataFrame({
+        "symbol": [f"SYM{i}" for i in range(rows)],
+        "exchange": np.where(rng.random(rows) < 0.8, "NSE", "BSE"),
+        "entry1": entry1,
+        "entry2": entry2,
+        "entry3": entry3,
+        "Allocated": rng.choice([10000, 25000, 50000, 100000], rows),
+    })
+    allocated_qty = (df["Allocated"].to_numpy() / ltp).astype(int)
+    held = np.where(rng.random(rows) < 0.5, 0, (allocated_qty * rng.uniform(0, 1, rows)).astype(int))
+    return df, ltp, held
+
+
+def run_scalar(scrips, ltp, held):
+    quotes = _StaticQuotes(dict(zip((s["symbol"] for s in scrips), ltp.tolist())))
+    holdings = _StaticHoldings(dict(zip((s["symbol"] for s in scrips), held.tolist())))
+    plans = []
+    for scrip in scrips:
+        plans.extend(generate_gtt_plan(None, scrip, quotes, holdings))
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'Rows':>8} {'Scalar (s)':>12} {'Batch (s)':>12} {'Speedup':>10} {'Plans':>8} {'Match':>6}")
+    for rows in args.rows:
+        df, ltp, held = make_sheet(rows)
+        # Both planners read the sheet the way the app does, blank cells and all
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "entry_levels.csv")
+            df.to_csv(path, index=False)
+            scrips = read_csv(path)
+            df = pd.read_csv(path)
+
+        start = time.perf_counter()
+        scalar = run_scalar(scrips, ltp, held)
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = generate_gtt_plans(df, ltp, held)
+        batch_time = time.perf_counter() - start
+
+        match = scalar == batch.to_dict(orient="records")
+        speedup = scalar_time / batch_time if batch_time else float("inf")
+        print(f"{rows:>8} {scalar_time:>12.3f} {batch_time:>12.4f} {speedup:>9.1f}x {len(batch):>8} {str(match):>6}")
+
+
+if __name__ == "__main__":
+    main()
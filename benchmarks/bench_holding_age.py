@@ -0,0 +1,83 @@
+"""
+Compare the per-holding iterrows() lot matching analyze_holdings used with
+the vectorized holding_ages over a synthetic tradebook.
+
+    python -m benchmarks.bench_holding_age --trades 10000 100000 500000
+"""
+import argparse
+import time
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from core.analytics import holding_ages
+
+
+def make_tradebook(trades, holdings, seed=3):
+    rng = np.random.default_rng(seed)
+    symbols = np.array([f"SYM{i}" for i in range(holdings * 2)])
+    df = pd.DataFrame({
+        "symbol": rng.choice(symbols, trades),
+        "trade_date": pd.Timestamp("2026-10-16") - pd.to_timedelta(rng.integers(0, 2000, trades), unit="D"),
+        "quantity": rng.integers(1, 200, trades).astype(float),
+    })
+    # Half the symbols are held, some for more than was ever bought
+    bought = df.groupby("symbol")["quantity"].sum()
+    held = {s: int(bought.get(s, 0) * rng.uniform(0.05, 1.2)) for s in symbols[:holdings]}
+    return df, held
+
+
+def loop_ages(trades_df, held, today):
+    result = {}
+    for symbol, quantity in held.items():
+        symbol_trades = trades_df[trades_df["symbol"].str.upper() == symbol]
+        symbol_trades = symbol_trades.sort_values(by="trade_date", ascending=False)
+        qty_needed = quantity
+        weighted_sum = 0
+        total_qty = 0
+        for _, trade in symbol_trades.iterrows():
+            if qty_needed <= 0:
+                break
+            used_qty = min(qty_needed, trade["quantity"])
+            weighted_sum += used_qty * trade["trade_date"].date().toordinal()
+            total_qty += used_qty
+            qty_needed -= used_qty
+        if total_qty > 0:
+            avg_date = datetime.fromordinal(int(weighted_sum / total_qty)).date()
+            result[symbol] = (today - avg_date).days
+        else:
+            result[symbol] = 0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trades", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--holdings", type=int, default=150)
+    parser.add_argument("--skip-loop-above", type=int, default=200000,
+                        help="only time the vectorized version beyond this many trades")
+    args = parser.parse_args()
+    today = date(2026, 10, 17)
+
+    print(f"{'Trades':>8} {'Holdings':>9} {'Loop (s)':>10} {'Batch (s)':>10} {'Speedup':>9} {'Match':>6}")
+    for trades in args.trades:
+        df, held = make_tradebook(trades, args.holdings)
+
+        start = time.perf_counter()
+        ages = holding_ages(df, held, today=today)
+        batch_time = time.perf_counter() - start
+
+        if trades > args.skip_loop_above:
+            print(f"{trades:>8} {len(held):>9} {'-':>10} {batch_time:>10.4f} {'-':>9} {'-':>6}")
+            continue
+
+        start = time.perf_counter()
+        looped = loop_ages(df, held, today)
+        loop_time = time.perf_counter() - start
+
+        match = all(int(ages.at[s, "days_held"]) == days for s, days in looped.items())
+        speedup = loop_time / batch_time if batch_time else float("inf")
+        print(f"{trades:>8} {len(held):>9} {loop_time:>10.3f} {batch_time:>10.4f} {speedup:>8.1f}x {str(match):>6}")
+
+
+if __name__ == "__main__":
+    main()
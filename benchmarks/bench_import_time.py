@@ -0,0 +1,84 @@
+"""
+Cold-start budget for the CLI: import core.gtt_menu (everything the menu
+loads before its first prompt; `main` itself defers it) in fresh
+interpreters with -X importtime and fail when it is over budget or pulls
+in a dependency that should only load when a menu action needs it.
+
+    python -m benchmarks.bench_import_time --budget-ms 100 --runs 5
+
+Exits with status 1 when the budget is blown, so it can gate CI.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded by the menu actions and the bootstrap, never by the import itself
+LAZY_MODULES = ("pandas", "numpy", "kiteconnect", "requests", "dotenv", "pyarrow")
+
+
+def import_profile(target):
+    """[(module, self_us, cumulative_us)] for one cold import of target."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def loaded_lazy_modules(target):
+    check = (
+        f"import sys, {target}; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", check], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="core.gtt_menu", help="module to import")
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--runs", type=int, default=5, help="best of this many cold imports")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        rows = import_profile(args.target)
+        total = next(cum for name, _, cum in rows if name == args.target)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total_us, rows = best
+
+    print(f"Cold import of {args.target}: {total_us / 1000:.1f} ms (best of {args.runs}), "
+          f"budget {args.budget_ms:.0f} ms")
+    print(f"\n{'Module':<40} {'Self ms':>8} {'Cumul. ms':>10}")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{name:<40} {self_us / 1000:>8.1f} {cum_us / 1000:>10.1f}")
+
+    failures = []
+    if total_us / 1000 > args.budget_ms:
+        failures.append(f"import took {total_us / 1000:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    eager = loaded_lazy_modules(args.target)
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+
+    if failures:
+        for failure in failures:
+            print(f"\n❌ {failure}")
+        sys.exit(1)
+    print("\n✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
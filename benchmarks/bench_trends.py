@@ -0,0 +1,84 @@
+"""
+Compare the per-symbol trend loop (what analyze_symbol_trend did for each
+holding) with the batch symbol_trends over a synthetic ROI history.
+
+    python -m benchmarks.bench_trends --symbols 150 1000 --days 100
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from core.analytics import TREND_THRESHOLD, symbol_trends
+
+
+def make_history(symbols, days, seed=11):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2026-10-16", periods=days).strftime("%Y-%m-%d")
+    # Random walks with some flat stretches and a few missing values
+    steps = rng.normal(0, 0.01, (symbols, days))
+    steps[rng.random((symbols, days)) < 0.2] = 0
+    roi = np.cumsum(steps, axis=1)
+    roi[rng.random((symbols, days)) < 0.01] = np.nan
+    # Shorter histories for some symbols, down to a single row
+    lengths = rng.integers(1, days + 1, symbols)
+    frames = []
+    for i in range(symbols):
+        n = lengths[i] if i % 5 == 0 else days
+        frames.append(pd.DataFrame({
+            "Date": dates[-n:],
+            "Symbol": f"SYM{i}",
+            "ROI per day": roi[i, -n:],
+        }))
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=seed)
+
+
+def loop_trend(df, symbol, threshold=TREND_THRESHOLD):
+    df = df[df["Symbol"].str.upper() == symbol.upper()]
+    if df.empty or len(df) < 2:
+        return None
+    df = df.sort_values("Date", ascending=True)
+    roi_series = df["ROI per day"].values
+    trend = None
+    count = 1
+    for i in range(len(roi_series) - 1, 0, -1):
+        diff = roi_series[i] - roi_series[i - 1]
+        if trend is None:
+            if abs(diff) <= threshold:
+                return "FLAT", 1
+            trend = "UP" if diff > 0 else "DOWN"
+            count = 1
+        elif trend == "UP" and diff > threshold:
+            count += 1
+        elif trend == "DOWN" and diff < -threshold:
+            count += 1
+        else:
+            break
+    return trend, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[150, 1000])
+    parser.add_argument("--days", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'Symbols':>8} {'Rows':>8} {'Loop (s)':>10} {'Batch (s)':>10} {'Speedup':>9} {'Match':>6}")
+    for symbols in args.symbols:
+        df = make_history(symbols, args.days)
+        names = sorted(df["Symbol"].unique())
+
+        start = time.perf_counter()
+        looped = {s: loop_trend(df, s) for s in names}
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = symbol_trends(df)
+        batch_time = time.perf_counter() - start
+
+        match = all(batch.get(s) == looped[s] for s in names)
+        speedup = loop_time / batch_time if batch_time else float("inf")
+        print(f"{symbols:>8} {len(df):>8} {loop_time:>10.3f} {batch_time:>10.4f} {speedup:>8.1f}x {str(match):>6}")
+
+
+if __name__ == "__main__":
+    main()
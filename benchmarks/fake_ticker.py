@@ -0,0 +1,212 @@
+"""
+Local stand-in for the Kite ticker WebSocket (LTP mode only).
+
+Speaks just enough of RFC 6455 and the Kite binary tick format for
+core.quote_stream.QuoteStream to connect, subscribe and receive ticks:
+
+    server = FakeTickerServer(prices={408065: 1500.25})
+    server.start()
+    stream = QuoteStream(kite, cmp_manager, root=server.url, instrument_tokens=...)
+
+Run directly for a self-check against a real KiteTicker client:
+
+    python -m benchmarks.fake_ticker
+"""
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _recv_exact(conn, n):
+    data = b""
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("client closed")
+        data += chunk
+    return data
+
+
+def _send_frame(conn, payload, opcode):
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 1 << 16:
+        header += bytes([126]) + struct.pack(">H", length)
+    else:
+        header += bytes([127]) + struct.pack(">Q", length)
+    conn.sendall(header + payload)
+
+
+def _read_frame(conn):
+    b1, b2 = _recv_exact(conn, 2)
+    opcode = b1 & 0x0F
+    length = b2 & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", _recv_exact(conn, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", _recv_exact(conn, 8))[0]
+    mask = _recv_exact(conn, 4) if b2 & 0x80 else None
+    payload = _recv_exact(conn, length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def ltp_packet(ticks):
+    """Encode {instrument_token: price} as one Kite binary LTP message."""
+    body = struct.pack(">H", len(ticks))
+    for token, price in ticks.items():
+        body += struct.pack(">H", 8) + struct.pack(">ii", token, int(round(price * 100)))
+    return body
+
+
+class FakeTickerServer:
+    def __init__(self, prices=None, interval=0.1, host="127.0.0.1", port=0):
+        self.prices = dict(prices or {})
+        self.interval = interval
+        self.subscribed = set()
+        self.messages = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen()
+        self.host, self.port = self._sock.getsockname()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def set_price(self, token, price):
+        with self._lock:
+            self.prices[token] = price
+
+    def start(self):
+        threading.Thread(target=self._accept_loop, name="fake-ticker", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._sock.close()
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("client closed during handshake")
+            request += chunk
+        headers = {}
+        for line in request.decode().split("\r\n")[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest()
+        ).decode()
+        conn.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+
+    def _serve(self, conn):
+        try:
+            self._handshake(conn)
+        except Exception:
+            conn.close()
+            return
+        threading.Thread(target=self._tick_loop, args=(conn,), daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                opcode, payload = _read_frame(conn)
+                if opcode == 0x8:
+                    _send_frame(conn, payload[:2], 0x8)
+                    break
+                if opcode == 0x9:
+                    _send_frame(conn, payload, 0xA)
+                    continue
+                if opcode == 0x1:
+                    self._handle_text(json.loads(payload))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _handle_text(self, message):
+        with self._lock:
+            self.messages.append(message)
+            if message.get("a") == "subscribe":
+                self.subscribed.update(message["v"])
+            elif message.get("a") == "unsubscribe":
+                self.subscribed.difference_update(message["v"])
+
+    def _tick_loop(self, conn):
+        while not self._stop.is_set():
+            with self._lock:
+                ticks = {t: self.prices[t] for t in self.subscribed if t in self.prices}
+            try:
+                # A single byte is a heartbeat; ticks go out as one binary frame
+                _send_frame(conn, ltp_packet(ticks) if ticks else b"\x00", 0x2)
+            except OSError:
+                return
+            time.sleep(self.interval)
+
+
+def main():
+    from core.quote_stream import QuoteStream
+
+    class _Cache:
+        _symbols = {("NSE", "INFY"), ("NSE", "TCS")}
+
+        def __init__(self):
+            self.prices = {}
+
+        def apply_ticks(self, prices):
+            self.prices.update(prices)
+
+        def attach_stream(self, stream):
+            pass
+
+    class _Kite:
+        api_key = "fake"
+        access_token = "fake"
+
+    server = FakeTickerServer(prices={408065: 1500.25, 2953217: 3890.5}).start()
+    cache = _Cache()
+    stream = QuoteStream(_Kite(), cache, root=server.url,
+                         instrument_tokens={("NSE", "INFY"): 408065, ("NSE", "TCS"): 2953217})
+    stream.start()
+    deadline = time.time() + 10
+    while len(cache.prices) < 2 and time.time() < deadline:
+        time.sleep(0.1)
+    print(f"Received: {cache.prices}")
+
+    server.set_price(408065, 1510.0)
+    stream.update_symbols({("NSE", "INFY")})
+    time.sleep(1)
+    print(f"After resubscribe: subscribed={sorted(server.subscribed)} prices={cache.prices}")
+    stream.stop()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Local stand-ins for the Kite Connect and Upstox APIs used by the benchmarks.
+
+FakeKite is an in-process replacement for KiteConnect; FakeUpstoxServer is a
+real HTTP server on localhost, so CMPManager and get_cmp_from_upstox go
+through their normal requests code paths. Both take a per-call latency and
+an error rate and count every call by endpoint.
+"""
+import csv
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from kiteconnect import exceptions
+
+
+class Universe:
+    """Synthetic symbols with ISINs, prices, entry levels, holdings and GTTs."""
+
+    def __init__(self, size, seed=11, held_ratio=0.5, gtt_ratio=0.3):
+        rng = random.Random(seed)
+        self.symbols = [f"SYM{i:05d}" for i in range(size)]
+        self.isins = {s: f"INE{i:07d}X" for i, s in enumerate(self.symbols)}
+        self.prices = {s: round(rng.uniform(20, 4000), 2) for s in self.symbols}
+
+        self.entry_levels = []
+        for s in self.symbols:
+            ltp = self.prices[s]
+            e1 = round(ltp * rng.uniform(0.9, 0.99), 2)
+            self.entry_levels.append({
+                "symbol": s,
+                "exchange": "NSE",
+                "entry1": e1,
+                "entry2": round(e1 * 0.93, 2),
+                "entry3": round(e1 * 0.86, 2),
+                "Allocated": rng.choice([10000, 25000, 50000]),
+            })
+
+        today = datetime.today()
+        self.holdings = []
+        self.trades = []
+        for i, s in enumerate(rng.sample(self.symbols, int(size * held_ratio))):
+            qty = rng.randint(1, 40)
+            self.holdings.append({
+                "tradingsymbol": s,
+                "exchange": "NSE",
+                "isin": self.isins[s],
+                "quantity": qty,
+                "t1_quantity": 0,
+                "average_price": round(self.prices[s] * rng.uniform(0.8, 1.1), 2),
+                "last_price": self.prices[s],
+            })
+            executed = today - timedelta(days=rng.randint(0, 400))
+            self.trades.append({
+                "tradingsymbol": s,
+                "exchange": "NSE",
+                "instrument_token": 100000 + i,
+                "transaction_type": "BUY",
+                "quantity": qty,
+                "average_price": self.prices[s],
+                "trade_id": str(1000000 + i),
+                "order_id": str(2000000 + i),
+                "exchange_timestamp": executed.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+
+        self.gtts = []
+        for i, s in enumerate(rng.sample(self.symbols, int(size * gtt_ratio))):
+            trigger = round(self.prices[s] * rng.uniform(0.85, 0.99), 2)
+            self.gtts.append({
+                "id": 500000 + i,
+                "status": "active",
+                "condition": {"exchange": "NSE", "tradingsymbol": s, "trigger_values": [trigger]},
+                "orders": [{"transaction_type": "BUY", "quantity": rng.randint(1, 20), "price": trigger}],
+            })
+
+    def write_roi_history(self, path, days, seed=13):
+        """Write a roi-master.csv with `days` weekdays of history for every holding."""
+        rng = random.Random(seed)
+        dates = []
+        day = datetime.today()
+        while len(dates) < days:
+            day -= timedelta(days=1)
+            if day.weekday() < 5:
+                dates.append(day.strftime("%Y-%m-%d"))
+        with open(path, "w") as f:
+            f.write("Date,Symbol,Invested Amount,Absolute Profit,Yield Per Day,"
+                    "Age of Stock,Profit Percentage,ROI per day\n")
+            for date in reversed(dates):
+                for h in self.holdings:
+                    roi = rng.uniform(-0.1, 0.2)
+                    f.write(f"{date},{h['tradingsymbol']},1000,10,0.1,100,1.0,{roi:.4f}\n")
+
+    def write_entry_levels_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.entry_levels[0]))
+            writer.writeheader()
+            writer.writerows(self.entry_levels)
+
+    def write_mapping_csv(self, path):
+        with open(path, "w") as f:
+            f.write("SYMBOL,NAME OF COMPANY, ISIN NUMBER\n")
+            for s in self.symbols:
+                f.write(f"{s},{s} Ltd, {self.isins[s]}\n")
+
+
+class FakeKite:
+    TRANSACTION_TYPE_BUY = "BUY"
+    TRANSACTION_TYPE_SELL = "SELL"
+    GTT_TYPE_SINGLE = "single"
+    ORDER_TYPE_LIMIT = "LIMIT"
+    PRODUCT_CNC = "CNC"
+
+    def __init__(self, universe, latency=0.0, error_rate=0.0, seed=3):
+        self.universe = universe
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.api_key = "bench"
+        self.access_token = "bench"
+        self._gtts = [dict(g) for g in universe.gtts]
+        self._next_id = 900000
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+            fail = self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise exceptions.NetworkException("Too many requests", code=429)
+
+    def profile(self):
+        self._call("profile")
+        return {"user_id": "BENCH"}
+
+    def holdings(self):
+        self._call("holdings")
+        return [dict(h) for h in self.universe.holdings]
+
+    def trades(self):
+        self._call("trades")
+        return [dict(t) for t in self.universe.trades]
+
+    def get_gtts(self):
+        self._call("get_gtts")
+        with self._lock:
+            return [dict(g) for g in self._gtts]
+
+    def place_gtt(self, trigger_type, tradingsymbol, exchange, trigger_values, last_price, orders):
+        self._call("place_gtt")
+        with self._lock:
+            self._next_id += 1
+            self._gtts.append({
+                "id": self._next_id,
+                "status": "active",
+                "condition": {"exchange": exchange, "tradingsymbol": tradingsymbol,
+                              "trigger_values": trigger_values},
+                "orders": orders,
+            })
+            return {"trigger_id": self._next_id}
+
+    def modify_gtt(self, trigger_id, trigger_type, tradingsymbol, exchange, trigger_values, last_price, orders):
+        self._call("modify_gtt")
+        with self._lock:
+            for g in self._gtts:
+                if g["id"] == trigger_id:
+                    g["condition"] = dict(g["condition"], trigger_values=trigger_values)
+                    g["orders"] = orders
+            return {"trigger_id": trigger_id}
+
+    def delete_gtt(self, trigger_id):
+        self._call("delete_gtt")
+        with self._lock:
+            self._gtts = [g for g in self._gtts if g["id"] != trigger_id]
+            return {"trigger_id": trigger_id}
+
+
+class FakeUpstoxServer:
+    """Serves /market-quote/quotes and /market-quote/ltp on localhost."""
+
+    def __init__(self, universe, latency=0.0, error_rate=0.0, seed=5):
+        self.universe = universe
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.bytes_sent = 0
+        self._symbol_by_isin = {isin: s for s, isin in universe.isins.items()}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="fake-upstox", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _quotes(self, instrument_keys):
+        data = {}
+        for key in instrument_keys:
+            segment, _, isin = key.partition("|")
+            symbol = self._symbol_by_isin.get(isin)
+            if symbol is None:
+                continue
+            price = self.universe.prices[symbol]
+            data[f"{segment}:{symbol}"] = {
+                "instrument_token": key,
+                "symbol": symbol,
+                "last_price": price,
+                "ohlc": {"open": price, "high": price, "low": price, "close": price},
+            }
+        return data
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with server._lock:
+                    server.bytes_sent += len(payload)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rsplit("/", 1)[-1]
+                with server._lock:
+                    server.calls[endpoint] += 1
+                    fail = server._rng.random() < server.error_rate
+                if server.latency:
+                    time.sleep(server.latency)
+                if fail:
+                    self._reply(503, {"status": "error", "errors": [{"errorCode": "UDAPI100500"}]})
+                    return
+                keys = ",".join(parse_qs(url.query).get("instrument_key", [])).split(",")
+                if endpoint in ("quotes", "ltp"):
+                    self._reply(200, {"status": "success", "data": server._quotes(k for k in keys if k)})
+                else:
+                    self._reply(404, {"status": "error"})
+
+        return Handler
@@ -0,0 +1,195 @@
+"""
+End-to-end benchmark of the menu flows against local Kite/Upstox stand-ins.
+
+For each portfolio size it drives the start-up bootstrap,
+CMPManager.refresh_cache, list_gtt_orders, sync_gtt_orders,
+analyze_gtt_orders and analyze_holdings, and reports wall
+time, broker/data API call counts and peak Python memory (tracemalloc).
+
+    python -m benchmarks.run_e2e --sizes 10 100 1000 10000 \
+        --kite-latency 0.02 --upstox-latency 0.05 --error-rate 0.01 \
+        --json bench_results.json
+
+Everything runs inside a temporary directory, so the data/ files written by
+analyze_holdings never touch the real ones.
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from benchmarks.fakes import FakeKite, FakeUpstoxServer, Universe
+
+
+def _patch_core(upstox_base):
+    import core.token_manager as token_manager
+
+    # The session manager "logs in" once and then serves the cached token
+    token_manager.generate_new_upstox_token = lambda: "bench-token"
+    token_manager.UPSTOX_API_BASE = upstox_base
+
+
+@contextlib.contextmanager
+def _answers(*replies):
+    """Feed canned answers to input() and swallow the menu's printing."""
+    queue = list(replies)
+    original = builtins.input
+    builtins.input = lambda prompt="": queue.pop(0) if queue else ""
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original
+
+
+def _measure(name, size, kite, upstox, fn, track_memory):
+    kite_before = Counter(kite.calls)
+    upstox_before = Counter(upstox.calls)
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    try:
+        fn()
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - start
+    peak = 0
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    kite_calls = kite.calls - kite_before
+    upstox_calls = upstox.calls - upstox_before
+    return {
+        "scenario": name,
+        "symbols": size,
+        "wall_s": round(wall, 4),
+        "kite_calls": dict(kite_calls),
+        "upstox_calls": dict(upstox_calls),
+        "peak_mb": round(peak / 1e6, 2),
+        "error": error,
+    }
+
+
+def run_size(size, args):
+    from core.cmp_cache import CMPManager
+    from core.gtt_logic import generate_gtt_plan
+    import core.gtt_menu as gtt_menu
+    from core.gtt_menu import analyze_gtt_orders, analyze_holdings, bootstrap, list_gtt_orders
+    from core.gtt_utils import TokenBucket, sync_gtt_orders
+    from core.portfolio import PortfolioSnapshot
+    from core.quote_cache import get_quote_cache
+
+    universe = Universe(size)
+    kite = FakeKite(universe, latency=args.kite_latency, error_rate=args.error_rate)
+    upstox = FakeUpstoxServer(universe, latency=args.upstox_latency, error_rate=args.error_rate).start()
+    _patch_core(upstox.base_url)
+    # Each size starts cold; quotes from a smaller universe would skew the fetch counts
+    get_quote_cache().clear()
+    results = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            os.makedirs("data", exist_ok=True)
+            mapping = os.path.join(workdir, "data", "Name-symbol-mapping.csv")
+            universe.write_mapping_csv(mapping)
+            universe.write_roi_history(os.path.join("data", "roi-master.csv"), args.history_days)
+            universe.write_entry_levels_csv(os.path.join("data", "entry_levels.csv"))
+            scrips = [dict(s) for s in universe.entry_levels]
+            gtt_menu.get_kite_session = lambda: kite
+            snapshot = PortfolioSnapshot(kite)
+            cmp_manager = CMPManager(csv_path=mapping, max_workers=args.workers)
+
+            def startup():
+                bootstrap(mapping_path=mapping, store_path=os.path.join("data", "cmp_cache.sqlite"))
+
+            def refresh():
+                cmp_manager.refresh_cache(snapshot.holdings, snapshot.gtts, scrips, force=True)
+
+            def listing():
+                with _answers("n"):
+                    list_gtt_orders(kite, scrips, cmp_manager, snapshot)
+
+            def sync():
+                plan = []
+                for scrip in scrips:
+                    plan.extend(generate_gtt_plan(kite, scrip, cmp_manager, snapshot))
+                sync_gtt_orders(kite, plan, snapshot=snapshot, max_workers=args.workers,
+                                rate_limiter=TokenBucket(args.order_rate), reconcile=True)
+
+            def analyze_gtts():
+                with _answers(""):
+                    analyze_gtt_orders(kite, cmp_manager, snapshot)
+
+            def analyze():
+                with _answers():
+                    analyze_holdings(kite, cmp_manager, snapshot)
+
+            for name, fn in [
+                ("bootstrap", startup),
+                ("refresh_cache", refresh),
+                ("list_gtt_orders", listing),
+                ("sync_gtt_orders", sync),
+                ("analyze_gtt_orders", analyze_gtts),
+                ("analyze_holdings", analyze),
+            ]:
+                results.append(_measure(name, size, kite, upstox, fn, not args.no_memory))
+        finally:
+            os.chdir(cwd)
+            upstox.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--kite-latency", type=float, default=0.0, help="seconds per Kite call")
+    parser.add_argument("--upstox-latency", type=float, default=0.0, help="seconds per Upstox request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--history-days", type=int, default=30, help="days of ROI history per holding")
+    parser.add_argument("--order-rate", type=float, default=10000, help="GTT calls per second")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows runs down)")
+    parser.add_argument("--json", help="append results to this JSON file")
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    results = []
+    print(f"{'Scenario':<20} {'Symbols':>8} {'Wall (s)':>10} {'Kite':>6} {'Upstox':>7} {'Peak MB':>8}")
+    print("-" * 64)
+    for size in args.sizes:
+        for r in run_size(size, args):
+            results.append(r)
+            kite_total = sum(r["kite_calls"].values())
+            upstox_total = sum(r["upstox_calls"].values())
+            flag = f"  ERROR: {r['error']}" if r["error"] else ""
+            print(f"{r['scenario']:<20} {r['symbols']:>8} {r['wall_s']:>10.3f} {kite_total:>6} "
+                  f"{upstox_total:>7} {r['peak_mb']:>8.2f}{flag}")
+
+    if args.json:
+        history = []
+        if os.path.exists(args.json):
+            with open(args.json) as f:
+                history = json.load(f)
+        history.append({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "args": vars(args),
+            "results": results,
+        })
+        with open(args.json, "w") as f:
+            json.dump(history, f, indent=2)
+        print(f"\nResults appended to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
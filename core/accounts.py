@@ -0,0 +1,184 @@
+import os
+import csv
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .token_manager import LoginRequired, get_account_session, get_session_manager, init_environment
+from .instrumentation import install_exit_hook, timed
+from .instrument_index import get_instrument_index
+from .cmp_cache import CMPManager
+from .portfolio import PortfolioSnapshot
+from .gtt_menu import GTT_PLACE_WORKERS, MAPPING_CSV_PATH, CMP_STORE_PATH, read_csv
+from .daemon import GttDaemon, _call_counts, _call_deltas, plan_and_sync
+
+# name,entry_levels,token_file — only name is required
+ACCOUNTS_FILE = "data/accounts.csv"
+ACCOUNTS_DIR = "data/accounts"  # default home of each account's entry_levels.csv
+ACCOUNT_WORKERS = 4  # accounts planned and synced at once
+
+
+class Account:
+    """One Kite account: its own session, entry levels and portfolio snapshot."""
+
+    def __init__(self, name, entry_levels=None, token_file=None):
+        self.name = name
+        self.entry_levels = entry_levels or os.path.join(ACCOUNTS_DIR, name, "entry_levels.csv")
+        self.token_file = token_file
+        self.kite = None
+        self.snapshot = None
+        self.scrips = []
+        self._scrips_mtime = None
+
+    def session(self):
+        return get_account_session(self.name, self.token_file)
+
+    def connect(self):
+        """Current Kite session from the account's manager; a new session gets a new snapshot."""
+        kite = self.session().kite()
+        if kite is not self.kite:
+            self.kite, self.snapshot = kite, PortfolioSnapshot(kite)
+
+    def reload_entry_levels(self):
+        """Re-read entry levels if the file changed; returns True when it did."""
+        try:
+            mtime = os.path.getmtime(self.entry_levels)
+        except OSError:
+            mtime = None
+        if mtime == self._scrips_mtime:
+            return False
+        self.scrips = read_csv(self.entry_levels)
+        self._scrips_mtime = mtime
+        return True
+
+
+def load_accounts(path=ACCOUNTS_FILE):
+    with open(path, newline="") as f:
+        rows = [row for row in csv.DictReader(f) if (row.get("name") or "").strip()]
+    accounts = [
+        Account(row["name"].strip(), (row.get("entry_levels") or "").strip() or None,
+                (row.get("token_file") or "").strip() or None)
+        for row in rows
+    ]
+    names = [a.name for a in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate account names in {path}")
+    return accounts
+
+
+class MultiAccountDaemon(GttDaemon):
+    """
+    The daemon loop for several accounts at once. Accounts are planned
+    and synced on a thread pool, but share one instrument index and one
+    CMPManager: each cycle fetches every account's holdings and GTTs,
+    refreshes quotes for the union of their symbols in a single pass (so a
+    symbol common to several accounts is fetched once), then plans and
+    syncs each account against its own session and snapshot. A failing
+    account is reported in the cycle record without stopping the others;
+    one that needs a new login reports login_required until it has one.
+    """
+
+    def __init__(self, accounts, dry_run=False, reconcile=None, prune=False, max_workers=GTT_PLACE_WORKERS,
+                 account_workers=ACCOUNT_WORKERS, mapping_path=MAPPING_CSV_PATH, store_path=CMP_STORE_PATH,
+                 output_path=None, cache_capacity=None):
+        super().__init__(dry_run=dry_run, reconcile=reconcile, prune=prune, max_workers=max_workers,
+                         mapping_path=mapping_path, store_path=store_path, output_path=output_path,
+                         cache_capacity=cache_capacity)
+        self.accounts = accounts
+        self.account_workers = account_workers
+        self._needs_login = set()
+
+    def _connect(self, account):
+        try:
+            with timed("bootstrap:account_session"):
+                account.connect()
+            account.reload_entry_levels()
+        except Exception as e:
+            logging.error(f"Could not start account {account.name}: {e}")
+
+    def start(self):
+        init_environment()
+        install_exit_hook()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.account_workers + 1) as pool:
+            index_future = pool.submit(lambda: get_instrument_index(self.mapping_path).load())
+            self.cmp_manager = CMPManager(csv_path=self.mapping_path, store_path=self.store_path,
+                                          cache_capacity=self.cache_capacity)
+            # Logins that need a prompt are serialized by the session managers
+            list(pool.map(self._connect, self.accounts))
+            index_future.result()
+        # Logins are prompted for at start-up only; Upstox quotes use the default session
+        get_session_manager().interactive = False
+        for account in self.accounts:
+            account.session().interactive = False
+        self.emit({"event": "started", "dry_run": self.dry_run,
+                   "accounts": [a.name for a in self.accounts],
+                   "connected": [a.name for a in self.accounts if a.kite is not None],
+                   "startup_s": round(time.perf_counter() - start, 4)})
+
+    def _load_portfolio(self, account):
+        account.connect()
+        if account.reload_entry_levels():
+            logging.info(f"Reloaded entry levels for {account.name}")
+        # Orders may have filled or triggered since the last cycle
+        account.snapshot.invalidate()
+        return account.snapshot.holdings, account.snapshot.gtts
+
+    def _sync(self, account):
+        return plan_and_sync(account.kite, account.scrips, self.cmp_manager, account.snapshot,
+                             dry_run=self.dry_run, reconcile=self.reconcile, prune=self.prune,
+                             max_workers=self.max_workers)
+
+    def _run_each(self, pool, fn, accounts, results):
+        """fn over accounts on the pool; failures go into results and drop the account."""
+        futures = {account.name: pool.submit(fn, account) for account in accounts}
+        done = {}
+        for account in accounts:
+            try:
+                done[account.name] = futures[account.name].result()
+                self._needs_login.discard(account.name)
+            except LoginRequired as e:
+                if account.name not in self._needs_login:
+                    logging.warning(f"Account {account.name} paused until a new login: {e}")
+                self._needs_login.add(account.name)
+                results[account.name] = {"login_required": str(e)}
+            except Exception as e:
+                logging.error(f"Account {account.name} failed: {e}")
+                results[account.name] = {"error": str(e)}
+        return done
+
+    def run_cycle(self):
+        self.cycles += 1
+        calls_before = _call_counts()
+        start = time.perf_counter()
+        record = {"event": "cycle", "cycle": self.cycles, "dry_run": self.dry_run}
+        results = {}
+        active = list(self.accounts)
+        try:
+            with timed("daemon:cycle"), ThreadPoolExecutor(max_workers=self.account_workers) as pool:
+                portfolios = self._run_each(pool, self._load_portfolio, active, results)
+                active = [a for a in active if a.name in portfolios]
+
+                holdings, gtts, scrips = [], [], []
+                for account in active:
+                    holdings.extend(portfolios[account.name][0])
+                    gtts.extend(portfolios[account.name][1])
+                    scrips.extend(account.scrips)
+                self.cmp_manager.refresh_cache(holdings, gtts, scrips)
+                self._login_required = False
+
+                results.update(self._run_each(pool, self._sync, active, results))
+        except LoginRequired as e:
+            # The shared Upstox session, which every account's quotes come from
+            if not self._login_required:
+                logging.warning(f"Daemon paused until a new login: {e}")
+            self._login_required = True
+            record["login_required"] = str(e)
+        except Exception as e:
+            logging.error(f"Daemon cycle {self.cycles} failed: {e}")
+            record["error"] = str(e)
+
+        record["accounts"] = {a.name: results.get(a.name, {}) for a in self.accounts}
+        record["duration_s"] = round(time.perf_counter() - start, 4)
+        record["api_calls"] = _call_deltas(calls_before)
+        self.emit(record)
+        return record
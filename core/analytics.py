@@ -0,0 +1,101 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+
+TREND_THRESHOLD = 0.002
+
+
+def symbol_trends(roi_df, threshold=TREND_THRESHOLD):
+    """
+    Trend of "ROI per day" for every symbol in roi_df in one grouped pass.
+    Returns {SYMBOL: ("UP"|"DOWN", n)} or ("FLAT", 1), the same answer
+    analyze_symbol_trend gives one symbol at a time: the latest change
+    decides the direction (within threshold is FLAT) and n counts how many
+    consecutive changes before it kept going that way. Symbols with fewer
+    than two rows are left out.
+    """
+    if roi_df.empty:
+        return {}
+
+    df = pd.DataFrame({
+        "Symbol": roi_df["Symbol"].astype(str).str.upper().to_numpy(),
+        "Date": pd.to_datetime(roi_df["Date"], errors="coerce").to_numpy(),
+        "roi": pd.to_numeric(roi_df["ROI per day"], errors="coerce").to_numpy(),
+    })
+    df = df.sort_values(["Symbol", "Date"], kind="stable").reset_index(drop=True)
+
+    symbols = df["Symbol"].to_numpy()
+    diff = df.groupby("Symbol", sort=False)["roi"].diff().to_numpy()
+    up = diff > threshold
+    down = diff < -threshold
+
+    # Rows where each symbol's history ends, and how long it is
+    is_last = np.append(symbols[1:] != symbols[:-1], True)
+    sizes = df.groupby("Symbol", sort=False).size()
+    last_idx = np.flatnonzero(is_last)
+
+    # NaN changes fail both comparisons and count as DOWN, as in the loop
+    last_diff = diff[last_idx]
+    flat = np.abs(last_diff) <= threshold
+    is_up = last_diff > threshold
+
+    # Follow the trend each symbol ended on; the latest change always counts
+    going_up = np.repeat(is_up, sizes.to_numpy())
+    continues = np.where(going_up, up, down)
+    continues[is_last] = True
+
+    # Length of the unbroken run of continuing changes at each symbol's end
+    broken = pd.Series(~continues[::-1]).groupby(symbols[::-1], sort=False).cumsum().to_numpy()[::-1]
+    streak = pd.Series(broken == 0).groupby(symbols, sort=False).sum()
+
+    trends = {}
+    for symbol, size, f, u, n in zip(sizes.index, sizes.to_numpy(), flat, is_up, streak.to_numpy()):
+        if size < 2:
+            continue
+        if f:
+            trends[symbol] = ("FLAT", 1)
+        else:
+            trends[symbol] = ("UP" if u else "DOWN", int(n))
+    return trends
+
+
+def holding_ages(trades_df, quantities, today=None):
+    """
+    Match each holding's quantity against its most recent buys (newest lot
+    first) for all symbols at once. trades_df needs symbol, trade_date and
+    quantity; quantities maps symbol -> quantity held. Returns a DataFrame
+    indexed by symbol with matched_qty, avg_entry_date (quantity-weighted
+    buy date) and days_held; symbols without buys get 0 days.
+    """
+    today = today or date.today()
+    needed = pd.Series(quantities, dtype=float)
+    needed.index = needed.index.astype(str).str.replace("#", "").str.upper()
+    needed = needed[~needed.index.duplicated(keep="last")]
+
+    trades = pd.DataFrame({
+        "symbol": trades_df["symbol"].astype(str).str.replace("#", "").str.upper().to_numpy(),
+        "trade_date": pd.to_datetime(trades_df["trade_date"], errors="coerce").to_numpy(),
+        "quantity": pd.to_numeric(trades_df["quantity"], errors="coerce").to_numpy(),
+    })
+    trades = trades[trades["symbol"].isin(needed.index)].dropna(subset=["trade_date", "quantity"])
+    trades = trades.sort_values(["symbol", "trade_date"], ascending=[True, False], kind="stable")
+
+    # Each lot supplies whatever the newer lots of that symbol left unmatched
+    qty = trades["quantity"].to_numpy()
+    filled_before = trades.groupby("symbol", sort=False)["quantity"].cumsum().to_numpy() - qty
+    remaining = needed.reindex(trades["symbol"]).to_numpy() - filled_before
+    used = np.clip(remaining, 0, qty)
+
+    ordinals = trades["trade_date"].dt.normalize().to_numpy().astype("datetime64[D]").astype(np.int64)
+    ordinals = ordinals + date(1970, 1, 1).toordinal()
+    sums = pd.DataFrame({"symbol": trades["symbol"].to_numpy(), "used": used, "weighted": used * ordinals})
+    sums = sums.groupby("symbol").sum().reindex(needed.index, fill_value=0)
+
+    result = pd.DataFrame(index=needed.index)
+    result["matched_qty"] = sums["used"]
+    matched = sums["used"].to_numpy() > 0
+    avg_ordinal = np.zeros(len(sums), dtype=np.int64)
+    avg_ordinal[matched] = (sums["weighted"].to_numpy()[matched] / sums["used"].to_numpy()[matched]).astype(np.int64)
+    result["avg_entry_date"] = [date.fromordinal(int(o)) if m else None for o, m in zip(avg_ordinal, matched)]
+    result["days_held"] = np.where(matched, today.toordinal() - avg_ordinal, 0)
+    return result
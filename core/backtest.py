@@ -0,0 +1,309 @@
+"""
+Replay the E1/E2/E3 GTT entry strategy over historical OHLC bars.
+
+    python -m core.backtest --data data/ohlc --entry-levels data/entry_levels.csv
+
+Every bar, each symbol is planned exactly as generate_gtt_plan would plan
+it with the previous close as LTP and the quantity bought so far as the
+holding, and the resulting GTT is checked against the bar's prices.
+"""
+import os
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from .analytics import holding_ages
+from .columnar import read_part
+from .gtt_logic import entry_orders, entry_quantities, select_entries
+
+OHLC_COLUMNS = ("open", "high", "low", "close")
+TIME_COLUMNS = ("date", "datetime", "timestamp", "time")
+BACKTEST_CHUNK = 512  # symbols simulated together; bounds the size of the grids
+ENTRY_LABELS = ("E1", "E2", "E3")
+
+
+def _read_bars(path):
+    df = read_part(path)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    time_col = next((c for c in TIME_COLUMNS if c in df.columns), None)
+    if time_col is None:
+        raise ValueError(f"{path} has no date/datetime column")
+    bars = pd.DataFrame({"time": pd.to_datetime(df[time_col], errors="coerce")})
+    for col in OHLC_COLUMNS:
+        bars[col] = pd.to_numeric(df[col], errors="coerce")
+    if "symbol" in df.columns:
+        bars["symbol"] = df["symbol"].astype(str).str.upper()
+    return bars
+
+
+def load_ohlc(path, symbols=None, start=None, end=None):
+    """
+    Load daily or intraday bars into symbols x time grids. path is either a
+    directory of per-symbol files (<SYMBOL>.csv or .parquet) or one file
+    with a symbol column; columns are date (or datetime), open, high, low,
+    close in any case. Bars a symbol lacks are NaN.
+    Returns (symbols, times, {"open": array, ...}) with arrays shaped (N, T).
+    """
+    # Repeated entry_levels rows must not repeat a grid row
+    wanted = None if symbols is None else list(dict.fromkeys(str(s).upper() for s in symbols))
+    if os.path.isdir(path):
+        frames = []
+        for name in sorted(os.listdir(path)):
+            symbol, ext = os.path.splitext(name)
+            if ext not in (".csv", ".parquet"):
+                continue
+            if wanted is not None and symbol.upper() not in wanted:
+                continue
+            bars = _read_bars(os.path.join(path, name))
+            bars["symbol"] = symbol.upper()
+            frames.append(bars)
+        bars = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=["time", *OHLC_COLUMNS, "symbol"])
+    else:
+        bars = _read_bars(path)
+        if "symbol" not in bars.columns:
+            raise ValueError(f"{path} needs a symbol column")
+
+    bars = bars.dropna(subset=["time"])
+    if wanted is not None:
+        bars = bars[bars["symbol"].isin(wanted)]
+    if start is not None:
+        bars = bars[bars["time"] >= pd.Timestamp(start)]
+    if end is not None:
+        bars = bars[bars["time"] <= pd.Timestamp(end)]
+    bars = bars.drop_duplicates(subset=["symbol", "time"], keep="last")
+
+    symbols = wanted if wanted is not None else sorted(bars["symbol"].unique())
+    times = pd.DatetimeIndex(sorted(bars["time"].unique()))
+    grids = {
+        col: bars.pivot(index="symbol", columns="time", values=col)
+        .reindex(index=symbols, columns=times).to_numpy(dtype=float)
+        for col in OHLC_COLUMNS
+    }
+    return list(symbols), times, grids
+
+
+def previous_close(close):
+    """LTP seen when planning each bar: the last close before it (NaN until there is one)."""
+    ltp = pd.DataFrame(close).ffill(axis=1).to_numpy()
+    return np.hstack([np.full((len(ltp), 1), np.nan), ltp[:, :-1]])
+
+
+def gtt_fills(order_price, trigger, ltp, open_, high, low):
+    """
+    Whether a BUY GTT placed before the bar fills during it, and at what
+    price. Momentum orders (order < trigger < ltp) fill once the low
+    reaches the limit, at the open if it gapped below. Reverse orders
+    (ltp < trigger < order) fire when the high reaches the trigger and fill
+    at the trigger or the open, if the limit is still in reach.
+    """
+    momentum = order_price < ltp
+    momentum_hit = low <= order_price
+    reverse_hit = (high >= trigger) & (low <= order_price)
+    filled = np.where(momentum, momentum_hit, reverse_hit)
+    price = np.where(
+        momentum,
+        np.minimum(open_, order_price),
+        np.minimum(np.maximum(open_, trigger), order_price),
+    )
+    return filled, price
+
+
+def _simulate_chunk(entries, allocated, grids):
+    """Fills for one block of symbols as (row, bar, level, qty, price) arrays."""
+    n, T = grids["close"].shape
+    ltp = previous_close(grids["close"])
+    valid = tuple(~np.isnan(entries[:, i])[:, None] for i in range(3))
+    _, plannable, qty, level_qty = entry_quantities(allocated[:, None], ltp, valid)
+
+    # Order, trigger and fill for every level at every bar it could be placed;
+    # only the holding decides which one is live
+    level_fill, level_price = [], []
+    for i in range(3):
+        cells = np.nonzero(level_qty[i] > 0)
+        cell_ltp = ltp[cells]
+        order_price, trigger = entry_orders(entries[cells[0], i], cell_ltp)
+        filled, price = gtt_fills(order_price, trigger, cell_ltp,
+                                  grids["open"][cells], grids["high"][cells], grids["low"][cells])
+        level_fill.append(np.zeros((n, T), dtype=bool))
+        level_fill[i][cells] = filled
+        level_price.append(np.full((n, T), np.nan))
+        level_price[i][cells] = price
+
+    fills = []
+    held = np.zeros(n, dtype=np.int64)
+    active = np.arange(n)
+    start = np.zeros(n, dtype=np.int64)
+    bars = np.arange(T)
+    # One vectorised pass per fill: find each symbol's next fill given what it holds so far
+    while active.size:
+        levels = select_entries(held[active][:, None], qty[active], tuple(v[active] for v in valid),
+                                plannable[active])
+        hit = np.zeros((active.size, T), dtype=bool)
+        for i in range(3):
+            hit |= levels[i] & level_fill[i][active]
+        hit &= bars >= start[active][:, None]
+
+        has_fill = hit.any(axis=1)
+        active = active[has_fill]
+        if not active.size:
+            break
+        bar = hit[has_fill].argmax(axis=1)
+        level = np.select([levels[i][has_fill, bar] for i in range(3)], [0, 1, 2])
+        fill_qty = np.choose(level, [level_qty[i][active, bar] for i in range(3)])
+        fill_price = np.choose(level, [level_price[i][active, bar] for i in range(3)])
+
+        fills.append((active, bar, level, fill_qty, fill_price))
+        held[active] += fill_qty
+        start[active] = bar + 1
+
+    if not fills:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, empty, np.array([], dtype=float)
+    return tuple(np.concatenate(parts) for parts in zip(*fills))
+
+
+def run_backtest(entry_levels, symbols, times, grids, chunk=BACKTEST_CHUNK):
+    """
+    Simulate entry_levels (rows with symbol, entry1..3 and Allocated)
+    against the grids from load_ohlc. Each symbol's Allocated is its own
+    budget; nothing is sold. Returns (holdings, fills, summary): holdings
+    has the analyze_holdings columns, valued at each symbol's last close,
+    fills lists every simulated buy, and summary holds portfolio totals and
+    capital use over time.
+    """
+    df = pd.DataFrame(entry_levels).copy()
+    df["symbol"] = df["symbol"].astype(str).str.upper()
+    df = df.drop_duplicates(subset="symbol", keep="last")
+    row_of = {s: i for i, s in enumerate(symbols)}
+    missing = sorted(set(df["symbol"]) - set(row_of))
+    if missing:
+        logging.warning(f"No bars for {len(missing)} symbols: {', '.join(missing[:10])}")
+    df = df[df["symbol"].isin(row_of)]
+    rows = df["symbol"].map(row_of).to_numpy(dtype=np.int64)
+    entries = np.column_stack([
+        pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) if col in df else np.full(len(df), np.nan)
+        for col in ("entry1", "entry2", "entry3")
+    ])
+    allocated = pd.to_numeric(df["Allocated"], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+    parts = []
+    for lo in range(0, len(rows), chunk):
+        block = rows[lo:lo + chunk]
+        row, bar, level, qty, price = _simulate_chunk(
+            entries[lo:lo + chunk], allocated[lo:lo + chunk], {col: grids[col][block] for col in OHLC_COLUMNS})
+        parts.append((block[row], bar, level, qty, price))
+    sym_row, bar, level, qty, price = (np.concatenate(p) for p in zip(*parts)) if parts else ([],) * 5
+
+    fills = pd.DataFrame({
+        "symbol": np.asarray(symbols, dtype=object)[np.asarray(sym_row, dtype=np.int64)],
+        "trade_date": times[np.asarray(bar, dtype=np.int64)],
+        "entry": np.asarray(ENTRY_LABELS, dtype=object)[np.asarray(level, dtype=np.int64)],
+        "quantity": np.asarray(qty, dtype=np.int64),
+        "price": np.asarray(price, dtype=float),
+    }).sort_values(["trade_date", "symbol"], kind="stable").reset_index(drop=True)
+    fills["cost"] = fills["quantity"] * fills["price"]
+
+    holdings = _holdings(fills, symbols, times, grids["close"])
+    summary = _summary(fills, holdings, times, allocated.sum())
+    return holdings, fills, summary
+
+
+def _holdings(fills, symbols, times, close):
+    """The analyze_holdings view of the simulated positions on the last bar."""
+    columns = ["Symbol", "Invested", "P&L", "Yld/Day", "ROI", "Days Held (Age)", "P&L%", "ROI/Day"]
+    if fills.empty:
+        return pd.DataFrame(columns=columns)
+    positions = fills.groupby("symbol").agg(quantity=("quantity", "sum"), invested=("cost", "sum"))
+    last_close = pd.Series(pd.DataFrame(close).ffill(axis=1).to_numpy()[:, -1], index=symbols)
+
+    quantity = positions["quantity"].to_numpy()
+    invested = positions["invested"].to_numpy()
+    pnl = quantity * last_close.reindex(positions.index).to_numpy() - invested
+    roi = np.divide(pnl * 100, invested, out=np.zeros_like(pnl), where=invested != 0)
+    ages = holding_ages(fills, positions["quantity"].to_dict(), today=times[-1].date())
+    days_held = ages["days_held"].reindex(positions.index).to_numpy()
+
+    held = days_held > 0
+    safe_days = np.where(held, days_held, 1)
+    holdings = pd.DataFrame({
+        "Symbol": positions.index,
+        "Invested": invested,
+        "P&L": pnl,
+        "Yld/Day": np.where(held, pnl / safe_days, 0),
+        "ROI": roi,
+        "Days Held (Age)": days_held,
+        "P&L%": roi,
+        "ROI/Day": np.where(held, roi / safe_days, 0),
+    })
+    return holdings.sort_values("ROI/Day", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _summary(fills, holdings, times, allocated_total):
+    deployed = np.zeros(len(times))
+    if not fills.empty:
+        bar = times.get_indexer(fills["trade_date"])
+        deployed = np.bincount(bar, weights=fills["cost"].to_numpy(), minlength=len(times)).cumsum()
+    in_market = deployed > 0
+    invested = float(holdings["Invested"].sum()) if not holdings.empty else 0.0
+    pnl = float(holdings["P&L"].sum()) if not holdings.empty else 0.0
+    roi = pnl / invested * 100 if invested else 0.0
+    # Capital-weighted, so large positions count for what they earned
+    roi_per_day = (float((holdings["ROI/Day"] * holdings["Invested"]).sum()) / invested) if invested else 0.0
+    return {
+        "start": times[0] if len(times) else None,
+        "end": times[-1] if len(times) else None,
+        "bars": len(times),
+        "symbols_entered": int(holdings["Symbol"].nunique()) if not holdings.empty else 0,
+        "fills": len(fills),
+        **{f"fills_{label}": int((fills["entry"] == label).sum()) for label in ENTRY_LABELS},
+        "allocated": float(allocated_total),
+        "invested": invested,
+        "pnl": pnl,
+        "roi_pct": roi,
+        "roi_per_day": roi_per_day,
+        "peak_capital": float(deployed.max()) if len(deployed) else 0.0,
+        "avg_capital": float(deployed[in_market].mean()) if in_market.any() else 0.0,
+        "capital_used_pct": float(deployed.max() / allocated_total * 100) if allocated_total else 0.0,
+    }
+
+
+def print_backtest(holdings, summary, top=20):
+    print(f"\n📈 Backtest {summary['start']} → {summary['end']} ({summary['bars']} bars)")
+    print(f"{'Symbol':<15} {'Invested':>10} {'P&L':>10} {'Yld/Day':>10} {'Age':>5} {'P&L%':>8} {'ROI/Day':>10}")
+    print("-" * 75)
+    for r in holdings.head(top).to_dict(orient="records"):
+        print(f"{r['Symbol']:<15} {r['Invested']:>10.2f} {r['P&L']:>10.2f} {r['Yld/Day']:>10.2f} "
+              f"{r['Days Held (Age)']:>5} {r['P&L%']:>8.2f} {r['ROI/Day']:>10.2f}")
+    print(f"\nFills: {summary['fills']} (E1 {summary['fills_E1']}, E2 {summary['fills_E2']}, "
+          f"E3 {summary['fills_E3']}) across {summary['symbols_entered']} symbols")
+    print(f"Invested {summary['invested']:.2f} of {summary['allocated']:.2f} allocated, "
+          f"P&L {summary['pnl']:.2f} ({summary['roi_pct']:.2f}%), ROI/Day {summary['roi_per_day']:.4f}")
+    print(f"Capital deployed: peak {summary['peak_capital']:.2f} ({summary['capital_used_pct']:.1f}% of allocation), "
+          f"average {summary['avg_capital']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the E1/E2/E3 GTT entry strategy")
+    parser.add_argument("--data", required=True, help="directory of per-symbol OHLC files, or one file with a symbol column")
+    parser.add_argument("--entry-levels", default="data/entry_levels.csv")
+    parser.add_argument("--start", help="first bar to replay (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last bar to replay (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=20, help="holdings to list")
+    parser.add_argument("--fills", help="write every simulated fill to this CSV")
+    args = parser.parse_args()
+
+    entry_levels = pd.read_csv(args.entry_levels)
+    symbols, times, grids = load_ohlc(args.data, symbols=entry_levels["symbol"], start=args.start, end=args.end)
+    if not len(times):
+        print("No bars in range.")
+        return
+    holdings, fills, summary = run_backtest(entry_levels, symbols, times, grids)
+    print_backtest(holdings, summary, args.top)
+    if args.fills:
+        fills.to_csv(args.fills, index=False)
+        print(f"Wrote {len(fills)} fills to {args.fills}")
+
+
+if __name__ == "__main__":
+    main()
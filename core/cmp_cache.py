@@ -1,19 +1,128 @@
+import os
+import json
 import time
+import sqlite3
 import logging
-import requests
-from .token_manager import get_valid_upstox_access_token
-from .gtt_logic import get_instrument_key_from_csv
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import token_manager
+from .token_manager import LoginRequired, get_valid_upstox_access_token, refresh_upstox_token
+from .instrument_index import get_instrument_index
+from .http_client import CircuitOpenError, get_http_client
+from .quote_cache import get_quote_cache
 
 class CMPManager:
-    def __init__(self, csv_path: str):
+    def __init__(self, csv_path: str, max_workers: int = 8, batch_size: int = 50, timeout: float = 10,
+                 store_path: str | None = None, cache=None, cache_capacity: int | None = None):
         self.csv_path = csv_path
-        self.cache = {}
+        self.store_path = store_path
+        # Bounded LRU with per-entry fetch times; stale entries are served while revalidating
+        self.cache = cache if cache is not None else get_quote_cache(cache_capacity)
+        if cache is not None and cache_capacity:
+            self.cache.resize(cache_capacity)
         self.last_updated = 0
-        self.ttl = 600  # 10 minutes
+        self.ttl = self.cache.ttl
+        self.max_workers = max_workers
+        self.batch_size = batch_size  # Upstox quotes API accepts up to 500 keys
+        self.timeout = timeout
+
+        # Shared keep-alive client: pooling, retries on 429/5xx, circuit breaker
+        self.http = get_http_client()
+
+        self._symbols = set()
+        self._prefetched = set()  # symbols prefetched before the tracked set is known
+        self._cache_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._pending = set()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._refresher = None
+        self._stream = None
+
+        if store_path:
+            self.load_store()
 
     def _is_cache_valid(self):
         return (time.time() - self.last_updated) < self.ttl
 
+    def _is_fresh(self, key, now=None):
+        return self.cache.is_fresh(key, now)
+
+    def _store(self, quote_map):
+        now = time.time()
+        self.cache.put_many(quote_map, now)
+        self.last_updated = now
+        if self.store_path and quote_map:
+            self.save_store(quote_map, now)
+
+    def _connect_store(self):
+        os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.store_path, timeout=10)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS quotes ("
+            "exchange TEXT, symbol TEXT, quote TEXT, fetched_at REAL, "
+            "PRIMARY KEY (exchange, symbol))"
+        )
+        return conn
+
+    def load_store(self):
+        """Warm-start from the on-disk store, keeping only quotes still inside the TTL."""
+        try:
+            conn = self._connect_store()
+            try:
+                rows = conn.execute(
+                    "SELECT exchange, symbol, quote, fetched_at FROM quotes WHERE fetched_at > ?",
+                    (time.time() - self.ttl,)
+                ).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            logging.warning(f"Could not load CMP store {self.store_path}: {e}")
+            return 0
+
+        for exchange, symbol, quote, fetched_at in rows:
+            key = (exchange, symbol)
+            if fetched_at > self.cache.fetched_at(key):
+                self.cache.put(key, json.loads(quote), fetched_at)
+        logging.info(f"Loaded {len(rows)} fresh quotes from {self.store_path}")
+        return len(rows)
+
+    def save_store(self, quote_map=None, fetched_at=None):
+        """Upsert quotes (default: the whole cache) into the on-disk store."""
+        if quote_map is None:
+            rows = [
+                (exch, sym, json.dumps(quote), fetched_at)
+                for (exch, sym), quote, fetched_at in self.cache.entries()
+            ]
+        else:
+            rows = [(exch, sym, json.dumps(quote), fetched_at) for (exch, sym), quote in quote_map.items()]
+        try:
+            conn = self._connect_store()
+            try:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO quotes VALUES (?, ?, ?, ?)", rows)
+            finally:
+                conn.close()
+        except Exception as e:
+            logging.warning(f"Could not save CMP store {self.store_path}: {e}")
+
+    def apply_ticks(self, prices):
+        """Update last_price in place from streamed ticks ({(exchange, symbol): price})."""
+        updates = {}
+        for key, price in prices.items():
+            quote = dict(self.cache.peek(key) or {})
+            quote["last_price"] = price
+            updates[key] = quote
+        self.cache.put_many(updates)
+
+    def attach_stream(self, stream):
+        self._stream = stream
+
+    def expired_symbols(self, symbols=None):
+        now = time.time()
+        symbols = self._symbols if symbols is None else symbols
+        return [key for key in symbols if not self._is_fresh(key, now)]
+
     def _collect_symbols(self, holdings, gtts, entry_levels):
         symbols = set()
         for h in holdings:
@@ -27,83 +136,185 @@ class CMPManager:
 
         return list(symbols)
 
-    def _fetch_bulk_quote_upstox(self, symbols):
-        def fetch_quotes(token, instrument_keys):
+    def _fetch_batch(self, batch_keys, interactive=True):
+        import requests
+
+        def fetch_quotes(token):
             headers = {
                 "Accept": "application/json",
                 "Authorization": f"Bearer {token}"
             }
-            params = {"instrument_key": ",".join(instrument_keys)}
-            url = "https://api.upstox.com/v2/market-quote/quotes"
-            return requests.get(url, headers=headers, params=params)
+            params = {"instrument_key": ",".join(batch_keys)}
+            url = f"{token_manager.UPSTOX_API_BASE}/market-quote/quotes"
+            return self.http.get(url, endpoint="upstox:quotes", headers=headers, params=params,
+                                 timeout=self.timeout)
+
+        token = get_valid_upstox_access_token(interactive)
+        try:
+            response = fetch_quotes(token)
+        except (requests.RequestException, CircuitOpenError) as e:
+            logging.error(f"Failed to fetch batch quote: {e}")
+            return {}
+
+        if response.status_code == 401:
+            try:
+                error_data = response.json()
+                error_code = error_data.get("errors", [{}])[0].get("errorCode")
+                if error_code == "UDAPI100050":
+                    # Only the first batch to see the expired token refreshes it
+                    token = refresh_upstox_token(token, interactive)
+                    response = fetch_quotes(token)
+            except LoginRequired:
+                raise
+            except Exception as e:
+                logging.error(f"Error while handling token regeneration: {e}")
+                return {}
+
+        if response.status_code != 200:
+            logging.error(f"Failed to fetch batch quote: {response.status_code}")
+            return {}
+
+        return response.json().get("data", {})
 
-        from .token_manager import get_valid_upstox_access_token, generate_new_upstox_token
-        token = get_valid_upstox_access_token()
+    def _fetch_bulk_quote_upstox(self, symbols, interactive=True):
         instrument_keys = []
         symbol_map = {}
 
+        index = get_instrument_index(self.csv_path)
+        symbols_by_exchange = {}
         for exch, sym in symbols:
+            symbols_by_exchange.setdefault(exch, []).append(sym)
+
+        for exch, syms in symbols_by_exchange.items():
             segment = exch + "_EQ"
-            instrument_key = get_instrument_key_from_csv(sym, self.csv_path, segment)
-            if instrument_key:
-                instrument_keys.append(instrument_key)
-                normalized_key = f"{segment}:{sym}"
-                symbol_map[normalized_key] = (exch, sym)
-                logging.debug(f"Mapped {normalized_key} -> ({exch}, {sym})")
-            else:
-                logging.warning(f"Instrument key not found for {sym} in segment {segment}")
+            resolved = index.resolve_many(syms, segment)
+            for sym in syms:
+                instrument_key = resolved.get(sym)
+                if instrument_key:
+                    instrument_keys.append(instrument_key)
+                    normalized_key = f"{segment}:{sym}"
+                    symbol_map[normalized_key] = (exch, sym)
+                    logging.debug(f"Mapped {normalized_key} -> ({exch}, {sym})")
+                else:
+                    logging.warning(f"Instrument key not found for {sym} in segment {segment}")
 
         if not instrument_keys:
             logging.warning("No instrument keys found. Skipping quote fetch.")
             return {}
 
-        quote_map = {}
-        batch_size = 50
-
-        for i in range(0, len(instrument_keys), batch_size):
-            batch_keys = instrument_keys[i:i + batch_size]
-            response = fetch_quotes(token, batch_keys)
-
-            if response.status_code == 401:
-                try:
-                    error_data = response.json()
-                    error_code = error_data.get("errors", [{}])[0].get("errorCode")
-                    if error_code == "UDAPI100050":
-                        logging.info("Invalid Upstox token detected. Regenerating token...")
-                        token = generate_new_upstox_token()
-                        response = fetch_quotes(token, batch_keys)
-                except Exception as e:
-                    logging.error(f"Error while handling token regeneration: {e}")
-                    continue
-
-            if response.status_code != 200:
-                logging.error(f"Failed to fetch batch quote: {response.status_code}")
-                continue
+        batches = [
+            instrument_keys[i:i + self.batch_size]
+            for i in range(0, len(instrument_keys), self.batch_size)
+        ]
+        if self.max_workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                batch_results = list(pool.map(lambda batch: self._fetch_batch(batch, interactive), batches))
+        else:
+            batch_results = [self._fetch_batch(batch, interactive) for batch in batches]
 
-            data = response.json().get("data", {})
+        quote_map = {}
+        for data in batch_results:
             for key, quote in data.items():
                 exch, sym = symbol_map.get(key, (None, None))
                 if exch and sym:
                     quote_map[(exch, sym)] = quote
                     logging.debug(f"✅ Added to cache: {sym} ({exch}) -> CMP: {quote.get('last_price')}")
 
-        logging.info(f"Fetched quotes for {len(quote_map)} symbols")
+        logging.info(f"Fetched quotes for {len(quote_map)} symbols in {len(batches)} batches")
         return quote_map
 
     
-    def refresh_cache(self, holdings, gtts, entry_levels):
+    def refresh_cache(self, holdings, gtts, entry_levels, force=False):
+        """Track the collected symbol set and fetch only entries past their TTL."""
         symbols = self._collect_symbols(holdings, gtts, entry_levels)
-        self.cache = self._fetch_bulk_quote_upstox(symbols)
-        self.last_updated = time.time()
-        logging.info(f"CMP cache refreshed with {len(self.cache)} symbols.")
+        self._symbols = set(symbols)
+        # Tracked quotes must never push each other out
+        self.cache.reserve(len(self._symbols))
+        self._prefetched = set()
+        if self._stream is not None:
+            self._stream.update_symbols(self._symbols)
+        to_fetch = symbols if force else self.expired_symbols(symbols)
+        if to_fetch:
+            self._store(self._fetch_bulk_quote_upstox(to_fetch))
+        logging.info(
+            f"CMP cache refreshed: {len(to_fetch)} fetched, "
+            f"{len(symbols) - len(to_fetch)} still fresh, {len(self.cache)} cached."
+        )
+
+    def prefetch(self, holdings=(), gtts=(), entry_levels=()):
+        """
+        Fetch expired quotes for part of the symbol set without changing the
+        tracked set, so startup can begin before every source has loaded.
+        """
+        extra = self._collect_symbols(holdings, gtts, entry_levels)
+        with self._cache_lock:
+            self._prefetched |= set(extra)
+            self.cache.reserve(len(self._symbols | self._prefetched))
+        return self.refresh_stale(extra=extra)
+
+    def refresh_stale(self, extra=(), interactive=True):
+        """
+        Delta refresh: fetch tracked symbols whose entries have expired.
+        interactive=False raises LoginRequired instead of prompting for an
+        Upstox login.
+        """
+        with self._refresh_lock:
+            stale = set(self.expired_symbols()) | set(self.expired_symbols(extra))
+            if stale:
+                logging.debug(f"Revalidating {len(stale)} stale CMP entries")
+                self._store(self._fetch_bulk_quote_upstox(list(stale), interactive))
+            return len(stale)
+
+    def _revalidate(self, key):
+        if self._refresher is not None and self._refresher.is_alive():
+            with self._cache_lock:
+                self._pending.add(key)
+            self._wakeup.set()
+        else:
+            self.refresh_stale(extra=[key])
+
+    def start_background_refresh(self, interval=None):
+        """Refresh expired entries on a daemon thread; reads never block on it."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        interval = interval or self.ttl / 2
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+                if self._stop.is_set():
+                    break
+                with self._cache_lock:
+                    pending, self._pending = self._pending, set()
+                try:
+                    # The menu owns stdin; a login is left to the next foreground refresh
+                    self.refresh_stale(extra=pending, interactive=False)
+                except LoginRequired:
+                    logging.debug("Background CMP refresh skipped until the next Upstox login")
+                except Exception as e:
+                    logging.error(f"Background CMP refresh failed: {e}")
+
+        self._refresher = threading.Thread(target=run, name="cmp-refresher", daemon=True)
+        self._refresher.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=5)
+            self._refresher = None
 
     def get_quote(self, exchange, symbol):
-        if not self._is_cache_valid():
-            raise RuntimeError("CMP cache is stale. Please refresh it first.")
-        return self.cache.get((exchange, symbol))
-    
+        key = (exchange, symbol)
+        quote = self.cache.get(key, allow_stale=True)
+        if quote is not None and not self._is_fresh(key):
+            self._revalidate(key)
+        return quote
+
     def get_cmp(self, exchange, symbol):
-        quote = self.cache.get((exchange, symbol))
+        quote = self.get_quote(exchange, symbol)
         if quote:
             return quote.get("last_price")
         return None
@@ -0,0 +1,51 @@
+import os
+import glob
+import uuid
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PART_FORMAT = "parquet"
+except ImportError:
+    # Without pyarrow, partitions fall back to plain CSV part files
+    PART_FORMAT = "csv"
+
+
+def list_parts(directory):
+    """Part files under directory (recursively), oldest first by name."""
+    parts = glob.glob(os.path.join(directory, "**", "*.parquet"), recursive=True)
+    parts += glob.glob(os.path.join(directory, "**", "*.csv"), recursive=True)
+    return sorted(parts)
+
+
+def write_part(df, directory, name=None):
+    """Write df as a new part file in directory and return its path."""
+    os.makedirs(directory, exist_ok=True)
+    name = name or f"part-{pd.Timestamp.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(directory, f"{name}.{PART_FORMAT}")
+    tmp_path = path + ".tmp"
+    if PART_FORMAT == "parquet":
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_part(path, columns=None, filters=None):
+    """
+    Read one part file. filters is a list of (column, "in", values) tuples;
+    Parquet applies them on read, CSV parts are filtered after loading.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+    usecols = None
+    if columns is not None:
+        usecols = list(dict.fromkeys(list(columns) + [col for col, _, _ in filters or []]))
+    df = pd.read_csv(path, usecols=lambda c: usecols is None or c in usecols, dtype=str)
+    for col, _, values in filters or []:
+        df = df[df[col].isin(values)]
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from .token_manager import IST, LoginRequired, get_session_manager, init_environment
+from .instrumentation import install_exit_hook, metrics, timed
+from .gtt_menu import (
+    CSV_FILE_PATH, GTT_PLACE_WORKERS, GTT_RECONCILE, MAPPING_CSV_PATH, CMP_STORE_PATH,
+    bootstrap, read_csv,
+)
+from .gtt_logic import generate_gtt_plan
+from .gtt_utils import sync_gtt_orders
+from .portfolio import PortfolioSnapshot
+
+# NSE cash session, IST
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+DAEMON_INTERVAL = 5  # minutes between cycles
+
+
+def is_market_open(now=None):
+    now = now or datetime.now(IST)
+    if now.weekday() >= 5:
+        return False
+    minutes = now.hour * 60 + now.minute
+    return MARKET_OPEN[0] * 60 + MARKET_OPEN[1] <= minutes < MARKET_CLOSE[0] * 60 + MARKET_CLOSE[1]
+
+
+def _call_counts():
+    return {endpoint: stats["count"] for endpoint, stats in metrics.snapshot().items()}
+
+
+def _call_deltas(before):
+    after = _call_counts()
+    return {
+        endpoint: count - before.get(endpoint, 0)
+        for endpoint, count in after.items()
+        if count != before.get(endpoint, 0) and not endpoint.startswith("daemon:")
+    }
+
+
+def plan_and_sync(kite, scrips, cmp_manager, snapshot, dry_run=False, reconcile=False, prune=False,
+                  max_workers=GTT_PLACE_WORKERS):
+    """
+    Plan GTTs for every entry level and sync them to one account; returns
+    the cycle record fields. Pruning only touches symbols that were planned
+    with a valid CMP, and is skipped altogether when any CMP lookup failed,
+    so a quote outage never reads as "delete every GTT".
+    """
+    plan = []
+    evaluated = set()
+    cmp_failed = []
+    for scrip in scrips:
+        symbol = scrip.get("symbol")
+        try:
+            if not cmp_manager.get_cmp(scrip["exchange"], symbol):
+                cmp_failed.append(symbol)
+                continue
+            plan.extend(generate_gtt_plan(kite, scrip, cmp_manager, snapshot))
+            evaluated.add(symbol)
+        except Exception as e:
+            logging.warning(f"Skipping {symbol} due to error: {e}")
+            cmp_failed.append(symbol)
+
+    if prune and cmp_failed:
+        logging.warning(f"Not pruning GTTs this cycle: {len(cmp_failed)} symbols could not be planned")
+    report = sync_gtt_orders(kite, plan, dry_run=dry_run, snapshot=snapshot, max_workers=max_workers,
+                             reconcile=reconcile, prune=prune and not cmp_failed, prune_symbols=evaluated)
+    return {
+        "symbols": len(scrips),
+        "planned": len(plan),
+        **{status: len(entries) for status, entries in report.items()},
+        "failed_symbols": [r["symbol"] for r in report["failed"]],
+        "unplanned_symbols": cmp_failed,
+        "pruned": bool(prune and not cmp_failed),
+    }
+
+
+class GttDaemon:
+    """
+    Headless plan -> reconcile -> place loop. The Kite session, instrument
+    index, CMP cache and portfolio snapshot come from one bootstrap() and
+    stay warm across cycles: each cycle only re-fetches holdings and GTTs,
+    re-reads entry levels if the CSV changed, and refreshes expired quotes.
+    The session comes from the SessionManager every cycle, so tokens renewed
+    on disk are picked up; a login is only prompted for at start-up, and
+    afterwards a cycle that needs one reports login_required instead.
+    Every cycle emits one JSON object (to stdout and optionally a JSONL file).
+    """
+
+    def __init__(self, dry_run=False, reconcile=None, prune=False, max_workers=GTT_PLACE_WORKERS,
+                 csv_path=CSV_FILE_PATH, mapping_path=MAPPING_CSV_PATH, store_path=CMP_STORE_PATH,
+                 output_path=None, cache_capacity=None):
+        self.dry_run = dry_run
+        self.reconcile = GTT_RECONCILE if reconcile is None else reconcile
+        self.prune = prune
+        self.max_workers = max_workers
+        self.csv_path = csv_path
+        self.mapping_path = mapping_path
+        self.store_path = store_path
+        self.output_path = output_path
+        self.cache_capacity = cache_capacity
+        self.cycles = 0
+        self._stop = threading.Event()
+        self.kite = self.scrips = self.snapshot = self.cmp_manager = None
+        self._scrips_mtime = None
+        self._snapshot_fresh = False
+        self._login_required = False
+
+    def start(self):
+        init_environment()
+        install_exit_hook()
+        self.kite, self.scrips, self.snapshot, self.cmp_manager, timings = bootstrap(
+            self.csv_path, self.mapping_path, self.store_path, self.cache_capacity)
+        self._scrips_mtime = self._csv_mtime()
+        self._snapshot_fresh = True
+        get_session_manager().interactive = False
+        self.emit({"event": "started", "dry_run": self.dry_run,
+                   "timings": {name: round(s, 4) for name, s in timings.items()}})
+
+    def _csv_mtime(self):
+        try:
+            return os.path.getmtime(self.csv_path)
+        except OSError:
+            return None
+
+    def emit(self, record):
+        record = {"time": datetime.now(IST).isoformat(timespec="seconds"), **record}
+        line = json.dumps(record, default=str)
+        print(line, flush=True)
+        if self.output_path:
+            with open(self.output_path, "a") as f:
+                f.write(line + "\n")
+
+    def run_cycle(self):
+        self.cycles += 1
+        calls_before = _call_counts()
+        start = time.perf_counter()
+        record = {"event": "cycle", "cycle": self.cycles, "dry_run": self.dry_run}
+        try:
+            with timed("daemon:cycle"):
+                kite = get_session_manager().kite()
+                if kite is not self.kite:
+                    self.kite, self.snapshot = kite, PortfolioSnapshot(kite)
+                    self._snapshot_fresh = False
+                self._login_required = False
+
+                mtime = self._csv_mtime()
+                if mtime != self._scrips_mtime:
+                    self.scrips = read_csv(self.csv_path)
+                    self._scrips_mtime = mtime
+                    record["entry_levels_reloaded"] = True
+
+                # Orders may have filled or triggered since the last cycle
+                if not self._snapshot_fresh:
+                    self.snapshot.invalidate()
+                self._snapshot_fresh = False
+                holdings, gtts = self.snapshot.holdings, self.snapshot.gtts
+                self.cmp_manager.refresh_cache(holdings, gtts, self.scrips)
+                record.update(plan_and_sync(self.kite, self.scrips, self.cmp_manager, self.snapshot,
+                                            dry_run=self.dry_run, reconcile=self.reconcile,
+                                            prune=self.prune, max_workers=self.max_workers))
+        except LoginRequired as e:
+            if not self._login_required:
+                logging.warning(f"Daemon paused until a new login: {e}")
+            self._login_required = True
+            record["login_required"] = str(e)
+        except Exception as e:
+            logging.error(f"Daemon cycle {self.cycles} failed: {e}")
+            record["error"] = str(e)
+
+        record["duration_s"] = round(time.perf_counter() - start, 4)
+        record["api_calls"] = _call_deltas(calls_before)
+        self.emit(record)
+        return record
+
+    def run(self, interval=DAEMON_INTERVAL, once=False, market_hours_only=True):
+        """Run cycles every `interval` minutes until stop(); once=True runs a single cycle."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                if once or not market_hours_only or is_market_open():
+                    self.run_cycle()
+                else:
+                    self.emit({"event": "idle", "reason": "market closed"})
+                if once:
+                    break
+                self._stop.wait(interval * 60)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.emit({"event": "stopped", "cycles": self.cycles})
+
+    def stop(self):
+        self._stop.set()
@@ -1,14 +1,13 @@
-import os
-import requests
+import math
 import logging
-import pandas as pd
-from dotenv import load_dotenv
-from .token_manager import get_valid_upstox_access_token, generate_new_upstox_token
-
-load_dotenv()
-
-RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
-RAPIDAPI_HOST = os.getenv("RAPIDAPI_HOST")
+import threading
+from . import token_manager
+from .token_manager import get_valid_upstox_access_token, refresh_upstox_token
+from .instrument_index import get_instrument_index
+from .portfolio import PortfolioSnapshot
+from .http_client import get_http_client
+from .quote_batcher import QuoteBatcher
+from .quote_cache import get_quote_cache
 
 CSV_PATH = "data/Name-symbol-mapping.csv"
 
@@ -16,32 +15,33 @@ LTP_ORDER_DIFF = 1.025
 LTP_TRIGGER_DIFF = 0.0026
 ORDER_TRIGGER_DIFF = 0.001
 
-cmp_cache = {}
-
-def get_cmp(kite, symbol, exchange):
-    key = f"{exchange}:{symbol}"
-    if key in cmp_cache:
-        return cmp_cache[key]
+def get_cmp(kite, symbol, exchange, snapshot=None):
+    # Shared with CMPManager, so a quote fetched by either side is reused
+    cache = get_quote_cache()
+    key = (exchange, symbol)
+    quote = cache.get(key)
+    if quote and quote.get("last_price"):
+        return float(quote["last_price"])
 
     # Try from holdings
     try:
-        for holding in kite.holdings():
-            holding_symbol = holding["tradingsymbol"].replace("#", "")  # Normalize holding symbol
-            if holding_symbol == symbol and holding["exchange"] == exchange:
-                cmp = float(holding["last_price"])
-                if cmp > 0:
-                    cmp_cache[key] = cmp
-                    return cmp
-                else:
-                    logging.debug(f"Zerodha LTP for {symbol} is 0, falling back to Upstox")
+        snapshot = snapshot or PortfolioSnapshot(kite)
+        holding = snapshot.holding(symbol, exchange)
+        if holding is not None:
+            cmp = float(holding["last_price"])
+            if cmp > 0:
+                cache.put(key, {"last_price": cmp})
+                return cmp
+            else:
+                logging.debug(f"Zerodha LTP for {symbol} is 0, falling back to Upstox")
     except Exception as e:
         logging.warning(f"Holdings fetch failed for {symbol}: {e}")
 
-    # Fallback to Upstox
+    # Fallback to Upstox; concurrent misses share one bulk request
     try:
-        cmp = get_cmp_from_upstox(symbol, exchange)
+        cmp = get_quote_batcher().get(exchange, symbol)
         if cmp and cmp > 0:
-            cmp_cache[key] = cmp
+            cache.put(key, {"last_price": cmp})
             return cmp
         else:
             raise ValueError(f"Invalid CMP fetched for {symbol}: {cmp}")
@@ -49,28 +49,38 @@ def get_cmp(kite, symbol, exchange):
         logging.error(f"Failed to fetch CMP from Upstox for {symbol}: {e}")
         raise
 
-def get_cmp_from_upstox(symbol, exchange):
+def get_cmps_from_upstox(symbols):
+    """
+    LTPs for many (exchange, symbol) pairs in one /market-quote/ltp call.
+    Returns {(exchange, symbol): ltp}; unknown or missing symbols are left out.
+    """
     try:
         access_token = get_valid_upstox_access_token()
         logging.debug(f"Access token retrieved for Upstox")
 
-        exchange_segment = exchange + "_EQ"
-        instrument_key = get_instrument_key_from_csv(symbol, CSV_PATH, exchange_segment)
-        logging.debug(f"Instrument key for {symbol}: {instrument_key}")
-        if not instrument_key:
-            logging.error(f"Instrument key not found for {symbol}")
-            return None
+        index = get_instrument_index(CSV_PATH)
+        instrument_keys = []
+        symbol_map = {}
+        for exchange, symbol in symbols:
+            exchange_segment = exchange + "_EQ"
+            instrument_key = index.resolve_many([symbol], exchange_segment).get(symbol)
+            if not instrument_key:
+                logging.error(f"Instrument key not found for {symbol}")
+                continue
+            instrument_keys.append(instrument_key)
+            symbol_map[f"{exchange_segment}:{symbol}"] = (exchange, symbol)
+        if not instrument_keys:
+            return {}
 
         def fetch_ltp(token):
             headers = {
                 "Accept": "application/json",
                 "Authorization": f"Bearer {token}"
             }
-            url = f"https://api.upstox.com/v2/market-quote/ltp?instrument_key={instrument_key}"
-            # logger.debug(f"Requesting LTP from Upstox: {url}")
-            response = requests.get(url, headers=headers)
+            url = f"{token_manager.UPSTOX_API_BASE}/market-quote/ltp"
+            params = {"instrument_key": ",".join(instrument_keys)}
+            response = get_http_client().get(url, endpoint="upstox:ltp", headers=headers, params=params)
             logging.debug(f"Upstox response status: {response.status_code}")
-            # logger.debug(f"Upstox response body: {response.text}")
             return response
 
         response = fetch_ltp(access_token)
@@ -80,41 +90,48 @@ def get_cmp_from_upstox(symbol, exchange):
                 error_data = response.json()
                 error_code = error_data.get("errors", [{}])[0].get("errorCode")
                 if error_code == "UDAPI100050":
-                    logging.info("Invalid Upstox token detected. Regenerating token...")
-                    access_token = generate_new_upstox_token()
+                    access_token = refresh_upstox_token(access_token)
                     response = fetch_ltp(access_token)
             except Exception as e:
                 logging.error(f"Error while handling token regeneration: {e}")
-                return None
+                return {}
 
         data = response.json().get("data")
         if not data:
-            logging.error(f"No 'data' field in Upstox response for {symbol}")
-            return None
+            logging.error(f"No 'data' field in Upstox response for {len(instrument_keys)} symbols")
+            return {}
 
-        actual_key = list(data.keys())[0]
-        cmp = data[actual_key]["last_price"]
-        logging.debug(f"Fetched CMP for {symbol} from Upstox: {cmp}")
-        return cmp
+        cmps = {}
+        for response_key, quote in data.items():
+            pair = symbol_map.get(response_key)
+            if pair is not None:
+                cmps[pair] = quote["last_price"]
+        logging.debug(f"Fetched {len(cmps)} CMPs from Upstox")
+        return cmps
 
     except Exception as e:
-        logging.error(f"Failed to fetch CMP from Upstox for {symbol}: {e}")
-        return None
+        logging.error(f"Failed to fetch CMPs from Upstox: {e}")
+        return {}
+
+def get_cmp_from_upstox(symbol, exchange):
+    return get_cmps_from_upstox([(exchange, symbol)]).get((exchange, symbol))
+
+_quote_batcher = None
+_quote_batcher_lock = threading.Lock()
+
+def get_quote_batcher():
+    """Process-wide QuoteBatcher over get_cmps_from_upstox."""
+    global _quote_batcher
+    with _quote_batcher_lock:
+        if _quote_batcher is None:
+            _quote_batcher = QuoteBatcher(get_cmps_from_upstox)
+        return _quote_batcher
 
 def get_instrument_key_from_csv(symbol, csv_path, exchange_segment="NSE_EQ"):
-    try:
-        df = pd.read_csv(csv_path)
-        df.columns = [col.strip() for col in df.columns]
-        match = df[df['SYMBOL'].str.upper() == symbol.upper()]
-        if not match.empty:
-            isin = match.iloc[0]['ISIN NUMBER'].strip()
-            return f"{exchange_segment}|{isin}"
-        else:
-            logging.error(f"Symbol '{symbol}' not found in the CSV.")
-            return None
-    except Exception as e:
-        logging.error(f"Error reading CSV or extracting instrument key: {e}")
-        return None
+    instrument_key = get_instrument_index(csv_path).resolve(symbol, exchange_segment)
+    if instrument_key is None:
+        logging.error(f"Symbol '{symbol}' not found in the CSV.")
+    return instrument_key
 
 def trigger_price_and_adjust_order(order_price, ltp):
     min_diff = round(ltp * LTP_TRIGGER_DIFF, 4)  # 0.26%
@@ -142,13 +159,21 @@ def trigger_price_and_adjust_order(order_price, ltp):
             return order_price, trigger
 
 
-def generate_gtt_plan(kite, scrip, cmp_manager):
+def _entry_level(scrip, key):
+    """A missing entry level, whether None or a blank (NaN) CSV cell, is None."""
+    value = scrip.get(key)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def generate_gtt_plan(kite, scrip, cmp_manager, snapshot=None):
 
     symbol = scrip["symbol"]
     exchange = scrip["exchange"]
-    entry1 = scrip.get("entry1")
-    entry2 = scrip.get("entry2")
-    entry3 = scrip.get("entry3")
+    entry1 = _entry_level(scrip, "entry1")
+    entry2 = _entry_level(scrip, "entry2")
+    entry3 = _entry_level(scrip, "entry3")
     allocated = scrip["Allocated"]
 
     ltp = cmp_manager.get_cmp(exchange, symbol) 
@@ -173,15 +198,8 @@ def generate_gtt_plan(kite, scrip, cmp_manager):
     qty3 = qty_splits[2] if entry3 is not None and num_valid > 2 else 0
 
     # Determine current holdings
-    holdings = kite.holdings()
-    total_qty = 0
-    for holding in holdings:
-        holding_symbol = holding["tradingsymbol"].replace("#", "")  # Normalize holding symbol
-        if holding_symbol == symbol:
-            holding_qty = holding["quantity"]
-            t1_qty = holding.get("t1_quantity", 0)
-            total_qty = holding_qty + t1_qty
-            break
+    snapshot = snapshot or PortfolioSnapshot(kite)
+    total_qty = snapshot.held_qty(symbol)
 
     logging.debug(f"Total quantity for {symbol} (Holdings + T1): {total_qty}")
 
@@ -233,5 +251,163 @@ def generate_gtt_plan(kite, scrip, cmp_manager):
     return plan
 
 
-
-
+def _two_product(a, b):
+    """Dekker's error-free product: a * b == p + e exactly (for finite, non-overflowing inputs)."""
+    split = 134217729.0  # 2**27 + 1
+    p = a * b
+    c = split * a
+    a_hi = c - (c - a)
+    a_lo = a - a_hi
+    c = split * b
+    b_hi = c - (c - b)
+    b_lo = b - b_hi
+    e = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+    return p, e
+
+
+def _round_exact(values, ndigits):
+    """
+    Vectorized equivalent of Python's round(x, ndigits).
+    np.round scales by 10**ndigits first, which can flip results that sit
+    on a .5 boundary; the rounding error of that scaling is recovered
+    exactly and decides which way those ties go (half-even on true ties).
+    """
+    import numpy as np
+    values = np.asarray(values, dtype=float)
+    scale = float(10 ** ndigits)
+    scaled = values * scale
+    whole = np.floor(scaled)
+    frac = scaled - whole
+    whole += frac > 0.5
+    # Only an exact .5 after scaling can hide which side of the tie the value was on
+    tie = frac == 0.5
+    if tie.any():
+        _, error = _two_product(values[tie], scale)
+        tie_whole = whole[tie]
+        whole[tie] += (error > 0) | ((error == 0) & (tie_whole % 2 == 1))
+    return whole / scale
+
+
+def trigger_prices_and_adjust_orders(order_prices, ltps):
+    """Array version of trigger_price_and_adjust_order; returns (order_prices, triggers)."""
+    import numpy as np
+    order_prices = np.asarray(order_prices, dtype=float)
+    ltps = np.asarray(ltps, dtype=float)
+
+    min_diff = _round_exact(ltps * LTP_TRIGGER_DIFF, 4)  # 0.26%
+    exact_diff = _round_exact(order_prices * ORDER_TRIGGER_DIFF, 4)  # 0.1%
+    momentum = order_prices < ltps
+
+    # Momentum order: order_price < trigger_price < ltp
+    min_trigger = _round_exact(ltps - min_diff, 2)
+    momentum_trigger = _round_exact(order_prices + exact_diff, 2)
+    momentum_keep = momentum_trigger < min_trigger
+
+    # Reverse order: ltp < trigger_price < order_price
+    max_trigger = _round_exact(ltps + min_diff, 2)
+    reverse_trigger = _round_exact(order_prices - exact_diff, 2)
+    reverse_keep = reverse_trigger > max_trigger
+
+    triggers = np.where(
+        momentum,
+        np.where(momentum_keep, momentum_trigger, min_trigger),
+        np.where(reverse_keep, reverse_trigger, max_trigger),
+    )
+    adjusted = np.where(
+        momentum,
+        np.where(momentum_keep, order_prices, _round_exact(min_trigger - exact_diff, 2)),
+        np.where(reverse_keep, order_prices, _round_exact(max_trigger + exact_diff, 2)),
+    )
+    return adjusted, triggers
+
+
+def entry_quantities(allocated, ltp, valid):
+    """
+    Quantities as generate_gtt_plan sizes them, for arrays that broadcast
+    together (e.g. per-symbol allocations against a symbols x time LTP
+    grid). valid is (entry1, entry2, entry3) presence masks. Returns
+    (has_ltp, plannable, qty, (qty1, qty2, qty3)).
+    """
+    import numpy as np
+    ltp = np.asarray(ltp, dtype=float)
+    valid1, valid2, valid3 = valid
+    num_valid = np.asarray(valid1, dtype=np.int64) + valid2 + valid3
+
+    has_ltp = ~np.isnan(ltp) & (ltp != 0)
+    plannable = has_ltp & (num_valid > 0)
+    safe_ltp = np.where(has_ltp, ltp, 1.0)
+    safe_num = np.maximum(num_valid, 1)
+
+    qty = np.where(plannable, np.trunc(allocated / safe_ltp), 0).astype(np.int64)
+    base = qty // safe_num
+    last = qty - base * (safe_num - 1)
+
+    qty1 = np.where(valid1, np.where(num_valid == 1, last, base), 0)
+    qty2 = np.where(valid2 & (num_valid > 1), np.where(num_valid == 2, last, base), 0)
+    qty3 = np.where(valid3 & (num_valid > 2), last, 0)
+    return has_ltp, plannable, qty, (qty1, qty2, qty3)
+
+
+def select_entries(held, qty, valid, plannable):
+    """(is_e1, is_e2, is_e3) masks: which level generate_gtt_plan would place at this holding."""
+    valid1, valid2, valid3 = valid
+    # Entry level logic based on holding thresholds
+    is_e1 = plannable & (held == 0) & valid1
+    is_e2 = plannable & ~is_e1 & (held <= qty // 3) & valid2
+    is_e3 = plannable & ~is_e1 & ~is_e2 & (held <= (2 * qty) // 3) & valid3
+    return is_e1, is_e2, is_e3
+
+
+def entry_orders(entry_price, ltp):
+    """(order_prices, triggers) for GTTs at entry_price, capped as generate_gtt_plan does."""
+    import numpy as np
+    entry_price = np.asarray(entry_price, dtype=float)
+    ltp = np.asarray(ltp, dtype=float)
+    capped = np.minimum(entry_price, _round_exact(ltp * LTP_ORDER_DIFF, 2))
+    order_price = np.where(entry_price > ltp, capped, entry_price)
+    return trigger_prices_and_adjust_orders(order_price, ltp)
+
+
+def generate_gtt_plans(df, ltp_array, held_qty_array):
+    """
+    Batch version of generate_gtt_plan over a whole entry_levels sheet.
+    ltp_array and held_qty_array are aligned with the rows of df. Missing
+    entry levels are NaN/None. Returns one row per planned GTT with the same
+    fields as generate_gtt_plan (symbol, exchange, price, trigger, qty, ltp,
+    entry), indexed by the source row of df.
+    """
+    import numpy as np
+    import pandas as pd
+    ltp = np.asarray(ltp_array, dtype=float)
+    held = np.asarray(held_qty_array, dtype=np.int64)
+    allocated = df["Allocated"].to_numpy(dtype=float)
+    entries = np.column_stack([
+        pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) if col in df else np.full(len(df), np.nan)
+        for col in ("entry1", "entry2", "entry3")
+    ])
+    valid = tuple(~np.isnan(entries[:, i]) for i in range(3))
+    has_ltp, plannable, qty, (qty1, qty2, qty3) = entry_quantities(allocated, ltp, valid)
+    is_e1, is_e2, is_e3 = select_entries(held, qty, valid, plannable)
+    selected = is_e1 | is_e2 | is_e3
+
+    entry_price = np.select([is_e1, is_e2, is_e3], [entries[:, 0], entries[:, 1], entries[:, 2]], np.nan)
+    plan_qty = np.select([is_e1, is_e2, is_e3], [qty1, qty2, qty3], 0)
+    entry_label = np.select([is_e1, is_e2, is_e3], ["E1", "E2", "E3"], "")
+
+    rows = np.flatnonzero(selected)
+    row_ltp = ltp[rows]
+    order_price, trigger = entry_orders(entry_price[rows], row_ltp)
+
+    skipped = int((~has_ltp).sum())
+    if skipped:
+        logging.debug(f"Batch plan: {skipped} rows skipped for missing CMP")
+
+    return pd.DataFrame({
+        "symbol": df["symbol"].to_numpy()[rows],
+        "exchange": df["exchange"].to_numpy()[rows],
+        "price": order_price,
+        "trigger": trigger,
+        "qty": plan_qty[rows],
+        "ltp": _round_exact(row_ltp, 2),
+        "entry": entry_label[rows],
+    }, index=df.index[rows])
@@ -1,23 +1,34 @@
 import logging
-import pandas as pd
-from .token_manager import get_kite_session
+from .token_manager import get_kite_session, init_environment
 from .gtt_logic import generate_gtt_plan,  trigger_price_and_adjust_order
 from .gtt_utils import sync_gtt_orders
 import textwrap
 from datetime import datetime
-import os
+import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .cmp_cache import CMPManager
+from .portfolio import PortfolioSnapshot, normalize_symbol
+from .instrumentation import install_exit_hook, timed
+from .instrument_index import get_instrument_index
 
 
 logging.basicConfig(level=logging.INFO)
 
 CSV_FILE_PATH = "data/entry_levels.csv"
+MAPPING_CSV_PATH = "data/Name-symbol-mapping.csv"
+CMP_STORE_PATH = "data/cmp_cache.sqlite"
+CMP_STREAMING = False  # stream live prices from the Kite ticker instead of polling
 DRY_RUN = False
+GTT_PLACE_WORKERS = 4
+GTT_RECONCILE = False  # modify existing GTTs in place to match the plan
 
 def read_csv(file_path):
+    import pandas as pd
     try:
-        return pd.read_csv(file_path).to_dict(orient="records")
+        df = pd.read_csv(file_path)
+        # Blank cells (e.g. a missing entry2/entry3) become None, not NaN
+        return df.astype(object).where(df.notna(), None).to_dict(orient="records")
     except Exception as e:
         logging.error(f"Failed to read CSV: {e}")
         return []
@@ -42,33 +53,28 @@ def print_wrapped_section(title, symbols, width=80):
     else:
         print("  None")
 
-def list_gtt_orders(kite, scrips, cmp_manager):
+def list_gtt_orders(kite, scrips, cmp_manager, snapshot=None, dry_run=None):
     import math
-    
+
+    dry_run = DRY_RUN if dry_run is None else dry_run
+    snapshot = snapshot or PortfolioSnapshot(kite)
     existing_orders = []
     new_orders = []
     fully_allocated_symbols = []
 
     # Fetch existing GTT orders from Zerodha
     try:
-        gtts = kite.get_gtts()
-        existing_symbols = [
+        existing_symbols = {
             g["condition"]["tradingsymbol"]
-            for g in gtts
-            if g["orders"][0]["transaction_type"] == kite.TRANSACTION_TYPE_BUY
-        ]
+            for g in snapshot.buy_gtts()
+        }
     except Exception as e:
         logging.error(f"Error fetching existing GTTs: {e}")
-        existing_symbols = []
+        existing_symbols = set()
 
     # Fetch current holdings
     try:
-        holdings = kite.holdings()
-        holdings_map = {
-        h["tradingsymbol"].replace("#", ""): h["quantity"] + h.get("t1_quantity", 0)
-        for h in holdings
-        }
-
+        holdings_map = snapshot.holdings_qty_map()
     except Exception as e:
         logging.error(f"Error fetching holdings: {e}")
         holdings_map = {}
@@ -84,13 +90,13 @@ def list_gtt_orders(kite, scrips, cmp_manager):
                 continue
             
             total_qty = math.floor(allocated / ltp)
-            held_qty = holdings_map.get(symbol, 0)
+            held_qty = holdings_map.get(normalize_symbol(symbol), 0)
 
             if held_qty >= total_qty:
                 fully_allocated_symbols.append(symbol)
                 continue
 
-            gtt_plan = gtt_plan = generate_gtt_plan(kite, scrip, cmp_manager)
+            gtt_plan = generate_gtt_plan(kite, scrip, cmp_manager, snapshot)
 
             if symbol in existing_symbols:
                 existing_orders.append(symbol)
@@ -121,14 +127,21 @@ def list_gtt_orders(kite, scrips, cmp_manager):
             print(f"{symbol:<15} {price:<15} {trigger:<15} {ltp:<15} {amount:<15} {entry:<15}")
 
     if input("\n1.1 Place GTT orders? (y/n): ").lower() == "y":
+        gtt_plan = []
         for scrip in scrips:
-            gtt_plan = gtt_plan = generate_gtt_plan(kite, scrip, cmp_manager)
-            sync_gtt_orders(kite, gtt_plan, dry_run=DRY_RUN)
+            gtt_plan.extend(generate_gtt_plan(kite, scrip, cmp_manager, snapshot))
+        report = sync_gtt_orders(kite, gtt_plan, dry_run=dry_run, snapshot=snapshot,
+                                 max_workers=GTT_PLACE_WORKERS, reconcile=GTT_RECONCILE)
+        print(f"\nPlaced: {len(report['placed'])}, Modified: {len(report['modified'])}, "
+              f"Skipped: {len(report['skipped'])}, Failed: {len(report['failed'])}")
+        if report["failed"]:
+            print_wrapped_section("❌ Failed to place GTT for:", [r["symbol"] for r in report["failed"]])
 
 
-def analyze_gtt_orders(kite, cmp_manager):
+def analyze_gtt_orders(kite, cmp_manager, snapshot=None):
+    snapshot = snapshot or PortfolioSnapshot(kite)
     try:
-        gtts = kite.get_gtts()
+        gtts = snapshot.gtts
         orders = []
         symbol_count = {}
         total_amount = 0.0
@@ -194,6 +207,7 @@ def analyze_gtt_orders(kite, cmp_manager):
                         print(f"Deleted GTT for {order['Symbol']} with variance {order['Variance (%)']}%")
                     except Exception as e:
                         print(f"Failed to delete GTT for {order['Symbol']}: {e}")
+            snapshot.invalidate(holdings=False, gtts=True)
 
         elif sub_choice == "2":
             target_variance = float(input("Enter target variance (e.g., -3 for -3%): "))
@@ -204,8 +218,8 @@ def analyze_gtt_orders(kite, cmp_manager):
                         
                         new_price, new_trigger = trigger_price_and_adjust_order(order_price=new_trigger, ltp=order["LTP"])
 
-                        kite.delete_gtt(order["GTT ID"])
-                        kite.place_gtt(
+                        kite.modify_gtt(
+                            trigger_id=order["GTT ID"],
                             trigger_type=kite.GTT_TYPE_SINGLE,
                             tradingsymbol=order["Symbol"],
                             exchange=order["Exchange"],
@@ -222,13 +236,17 @@ def analyze_gtt_orders(kite, cmp_manager):
                         print(f"Modified GTT for {order['Symbol']} to match variance {target_variance}%")
                     except Exception as e:
                         print(f"Failed to modify GTT for {order['Symbol']}: {e}")
+            snapshot.invalidate(holdings=False, gtts=True)
 
     except Exception as e:
         logging.error(f"Error analyzing GTTs: {e}")
 
 
 
-def update_tradebook(kite, tradebook_path="data/zerodha-tradebook-master.csv"):
+def update_tradebook(kite, store=None):
+    import pandas as pd
+    from .tradebook_store import TradebookStore
+
     # Fetch trades from Kite
     new_trades = kite.trades()
 
@@ -256,9 +274,7 @@ def update_tradebook(kite, tradebook_path="data/zerodha-tradebook-master.csv"):
     new_trades_df["segment"] = "EQ"
     new_trades_df["series"] = new_trades_df["symbol"].apply(lambda x: "EQ")
     new_trades_df["auction"] = False
-    new_trades_df["trade_date"] = pd.to_datetime(new_trades_df["order_execution_time"]).dt.date
-    new_trades_df["trade_date"] = new_trades_df["trade_date"].apply(lambda x: x.strftime("%#m/%#d/%Y"))
-
+    new_trades_df["trade_date"] = pd.to_datetime(new_trades_df["order_execution_time"]).dt.normalize()
 
     # Reorder columns to match the tradebook format
     new_trades_df = new_trades_df[[
@@ -266,28 +282,19 @@ def update_tradebook(kite, tradebook_path="data/zerodha-tradebook-master.csv"):
         "trade_type", "auction", "quantity", "price", "trade_id", "order_id", "order_execution_time"
     ]]
 
-    # Load existing tradebook if it exists
-    if os.path.exists(tradebook_path):
-        existing_df = pd.read_csv(tradebook_path)
-        existing_trade_ids = set(existing_df["trade_id"].astype(str))
-    else:
-        existing_df = pd.DataFrame(columns=new_trades_df.columns)
-        existing_trade_ids = set()
-
-    # Filter out trades that already exist
-    new_trades_df = new_trades_df[~new_trades_df["trade_id"].astype(str).isin(existing_trade_ids)]
+    # Append only trades whose trade_id is not already in the store
+    store = store or TradebookStore()
+    appended = store.append(new_trades_df)
 
-    if not new_trades_df.empty:
-        updated_df = pd.concat([existing_df, new_trades_df], ignore_index=True)
-        updated_df.to_csv(tradebook_path, index=False)
-        print(f"Appended {len(new_trades_df)} new trades to the tradebook.")
+    if appended:
+        print(f"Appended {appended} new trades to the tradebook.")
     else:
         print("No new trades to append.")
 
 
-def write_roi_results(results, output_path="data/roi-master.csv"):
-    # Ensure the output directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+def write_roi_results(results, roi_store=None):
+    import pandas as pd
+    from .roi_store import RoiStore
 
     # Get today's date and check if it's Saturday or Sunday
     today = datetime.today()
@@ -318,40 +325,44 @@ def write_roi_results(results, output_path="data/roi-master.csv"):
         "Yield Per Day", "Age of Stock", "Profit Percentage", "ROI per day"
     ]]
 
-    # Load existing file if it exists
-    if os.path.exists(output_path):
-        df_existing = pd.read_csv(output_path)
-    else:
-        df_existing = pd.DataFrame(columns=df_new.columns)
-
-    # Combine and drop duplicates based on Date and Symbol
-    df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-    df_combined.drop_duplicates(subset=["Date", "Symbol"], keep="last", inplace=True)
+    # Replace only today's partition in the ROI history
+    roi_store = roi_store or RoiStore()
+    roi_store.write_day(df_new, today_str)
 
-    # Save the updated file
-    df_combined.to_csv(output_path, index=False)
+    print(f"ROI results written to {roi_store.directory} ({today_str})")
 
-    print(f"ROI results written to {output_path}")
 
+def analyze_holdings(kite, cmp_manager, snapshot=None, store=None, roi_store=None):
+    import pandas as pd
+    from .analytics import holding_ages, symbol_trends
+    from .roi_store import RoiStore
+    from .tradebook_store import TradebookStore
 
-def analyze_holdings(kite, cmp_manager):
-    
-    update_tradebook(kite)
+    snapshot = snapshot or PortfolioSnapshot(kite)
+    store = store or TradebookStore()
+    roi_store = roi_store or RoiStore()
+    update_tradebook(kite, store)
 
     try:
-        import pandas as pd
-        from datetime import datetime
-
+        holdings = snapshot.holdings
+        results = []
 
-        tradebook_path = "data/zerodha-tradebook-master.csv"
-        trades_df = pd.read_csv(tradebook_path)
-        trades_df.columns = [col.strip().lower().replace(" ", "_") for col in trades_df.columns]
-        trades_df["trade_date"] = pd.to_datetime(trades_df["trade_date"], errors='coerce')
-        trades_df = trades_df[trades_df["trade_type"].str.lower() == "buy"]
+        trades_df = store.read(
+            columns=["symbol", "trade_date", "quantity"],
+            symbols=[h["tradingsymbol"] for h in holdings],
+            trade_type="buy",
+        )
 
-        holdings = kite.holdings()
-        results = []
+        # Weighted entry date of every holding, matched against its newest buys
+        ages = holding_ages(trades_df, {
+            h["tradingsymbol"]: h["quantity"] + h.get("t1_quantity", 0) for h in holdings
+        })
 
+        # One pass over the ROI history for every holding's trend
+        trends = symbol_trends(roi_store.read(
+            symbols=[h["tradingsymbol"] for h in holdings],
+            columns=["Date", "Symbol", "ROI per day"],
+        ))
 
         for holding in holdings:
             symbol = holding["tradingsymbol"]
@@ -371,35 +382,13 @@ def analyze_holdings(kite, cmp_manager):
             pnl_pct = (pnl / invested * 100) if invested else 0
             roi = pnl_pct
 
-            symbol_trades = trades_df[trades_df["symbol"].str.upper() == symbol_clean]
-            symbol_trades = symbol_trades.sort_values(by="trade_date", ascending=False)
-
-            qty_needed = quantity
-            weighted_sum = 0
-            total_qty = 0
-
-            for _, trade in symbol_trades.iterrows():
-                if qty_needed <= 0:
-                    break
-                trade_qty = trade["quantity"]
-                trade_date = trade["trade_date"].date()
-                used_qty = min(qty_needed, trade_qty)
-                weighted_sum += used_qty * trade_date.toordinal()
-                total_qty += used_qty
-                qty_needed -= used_qty
-
-            if total_qty > 0:
-                avg_date_ordinal = weighted_sum / total_qty
-                avg_date = datetime.fromordinal(int(avg_date_ordinal)).date()
-                days_held = (datetime.today().date() - avg_date).days
-            else:
-                days_held = 0
+            days_held = int(ages.at[symbol_clean, "days_held"])
 
             yld_per_day = (pnl / days_held) if days_held > 0 else 0
             roi_per_day = (roi / days_held) if days_held > 0 else 0
 
             # Get trend for this symbol
-            trend_result = analyze_symbol_trend(symbol)
+            trend_result = trends.get(symbol.upper())
             if trend_result:
                 trend_str = f"{trend_result[0]}({trend_result[1]})"
             else:
@@ -429,17 +418,15 @@ def analyze_holdings(kite, cmp_manager):
         print(f"An error occurred while analyzing holdings: {e}")
 
 
-    write_roi_results(results)
+    write_roi_results(results, roi_store)
 
     # Show trend of average ROI per day for the latest 5 dates
     try:
-        roi_path = "data/roi-master.csv"
-        if os.path.exists(roi_path):
-            df = pd.read_csv(roi_path)
+        # Only consider symbols in current holdings
+        holding_symbols = set(h["tradingsymbol"].replace("#", "").upper() for h in holdings)
+        df = roi_store.recent(5, symbols=holding_symbols, columns=["Date", "Symbol", "ROI per day"])
+        if not df.empty:
             df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-            # Only consider symbols in current holdings
-            holding_symbols = set(h["tradingsymbol"].replace("#", "").upper() for h in holdings)
-            df = df[df["Symbol"].str.upper().isin(holding_symbols)]
             # Group by date, get average ROI per day
             grouped = df.groupby("Date")["ROI per day"].mean().sort_index(ascending=False)
             latest_5 = grouped.head(5)[::-1]  # reverse to chronological order
@@ -448,13 +435,12 @@ def analyze_holdings(kite, cmp_manager):
     except Exception as e:
         print(f"Error showing average ROI/Day trend: {e}")
 
-def analyze_roi_trend(file_path="data/roi-master.csv", N=3):
+def analyze_roi_trend(roi_store=None, N=3, snapshot=None):
+    from .roi_store import RoiStore
     try:
-        df = pd.read_csv(file_path)
-        df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-        df.sort_values(by=["Symbol", "Date"], inplace=True)
+        roi_store = roi_store or RoiStore()
 
-        N = int(input("Enter the number of consecutive days for uptrend (N): "))
+        N = int(input(f"Enter the number of consecutive days for uptrend (N, up to {roi_store.max_window}): "))
 
         direction = input("Choose trend direction:\n1. View upward trend\n2. View downward trend\nEnter 1 or 2: ").strip()
         if direction not in {"1", "2"}:
@@ -463,44 +449,28 @@ def analyze_roi_trend(file_path="data/roi-master.csv", N=3):
 
         # Get current holdings symbols
         try:
-            from .token_manager import get_kite_session
-            kite = get_kite_session()
-            holdings = kite.holdings()
+            if snapshot is None:
+                from .token_manager import get_kite_session
+                snapshot = PortfolioSnapshot(get_kite_session())
+            holdings = snapshot.holdings
             holding_symbols = set(h["tradingsymbol"].replace("#", "").upper() for h in holdings)
         except Exception as e:
             print(f"Error fetching holdings for ROI filter: {e}")
             holding_symbols = set()
 
-        results = []
-
-        for symbol, group in df.groupby("Symbol"):
-            if symbol.upper() not in holding_symbols:
-                continue
-            # Sort by ascending date (oldest to latest)
-            group = group.sort_values("Date", ascending=True)
-            roi_series = group["ROI per day"].values[-N:]  # last N days, oldest to latest
+        # Streak state is kept current by write_roi_results, so no history scan
+        trending = roi_store.trending(N, "up" if direction == "1" else "down", symbols=holding_symbols)
 
-            if len(roi_series) < N:
-                continue
+        results = []
 
-            window = roi_series  # oldest to latest
-
-            if direction == "1" and all(x < y for x, y in zip(window, window[1:])):
-                change = window[-1] - window[0]
-                trend_str = " -> ".join(f"{roi:.3f}" for roi in window)
-                results.append({
-                    "Symbol": symbol,
-                    "Change": change,
-                    "Trend": trend_str
-                })
-            elif direction == "2" and all(x > y for x, y in zip(window, window[1:])):
-                change = window[0] - window[-1]
-                trend_str = " -> ".join(f"{roi:.3f}" for roi in window)
-                results.append({
-                    "Symbol": symbol,
-                    "Change": change,
-                    "Trend": trend_str
-                })
+        for symbol, window in sorted(trending.items()):
+            change = window[-1] - window[0] if direction == "1" else window[0] - window[-1]
+            trend_str = " -> ".join(f"{roi:.3f}" for roi in window)
+            results.append({
+                "Symbol": symbol,
+                "Change": change,
+                "Trend": trend_str
+            })
 
         sorted_results = sorted(results, key=lambda x: x["Change"], reverse=True)
 
@@ -513,46 +483,18 @@ def analyze_roi_trend(file_path="data/roi-master.csv", N=3):
         print(f"Error analyzing ROI trend: {e}")
 
 
-import pandas as pd
-
-def analyze_symbol_trend(symbol, file_path="data/roi-master.csv", threshold=0.002):
+def analyze_symbol_trend(symbol, roi_store=None, threshold=0.002):
     """
-    Analyze the trend (uptrend or downtrend) for a given symbol in roi-master.csv.
+    Analyze the trend (uptrend or downtrend) for a given symbol in the ROI history.
     Returns ("UP", n) or ("DOWN", n) where n is the number of days the trend has continued.
     Small fluctuations within the threshold are ignored.
     """
+    from .analytics import symbol_trends
+    from .roi_store import RoiStore
     try:
-        df = pd.read_csv(file_path)
-        df = df[df["Symbol"].str.upper() == symbol.upper()]
-        if df.empty or len(df) < 2:
-            return None
-
-        df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-        df = df.sort_values("Date", ascending=True)
-        roi_series = df["ROI per day"].values
-
-        trend = None
-        count = 1
-
-        for i in range(len(roi_series) - 1, 0, -1):
-            today = roi_series[i]
-            prev = roi_series[i - 1]
-            diff = today - prev
-
-            if trend is None:
-                if abs(diff) <= threshold:
-                    return "FLAT",1
-                trend = "UP" if diff > 0 else "DOWN"
-                count = 1
-            else:
-                if trend == "UP" and diff > threshold:
-                    count += 1
-                elif trend == "DOWN" and diff < -threshold:
-                    count += 1
-                else:
-                    break
-
-        return trend, count
+        roi_store = roi_store or RoiStore()
+        df = roi_store.read(symbols=[symbol], columns=["Date", "Symbol", "ROI per day"])
+        return symbol_trends(df, threshold).get(symbol.upper())
 
     except Exception as e:
         print(f"Error analyzing symbol trend: {e}")
@@ -560,26 +502,83 @@ def analyze_symbol_trend(symbol, file_path="data/roi-master.csv", threshold=0.00
 
 
 
-def main():
-    kite = get_kite_session()
-    scrips = read_csv(CSV_FILE_PATH)
-
-    try:
-        holdings = kite.holdings()
-    except Exception as e:
-        logging.error(f"Error fetching holdings: {e}")
-        holdings = []
+def bootstrap(csv_path=CSV_FILE_PATH, mapping_path=MAPPING_CSV_PATH, store_path=CMP_STORE_PATH,
+              cache_capacity=None):
+    """
+    Start-up work run concurrently: the Kite session, entry levels, the
+    instrument index and the CMP store load in parallel, holdings and GTTs
+    are fetched together once the session is up, and quotes for each
+    symbol source are fetched as soon as that source arrives.
+    cache_capacity sizes the shared quote cache (it still grows to fit the
+    tracked symbols). Returns (kite, scrips, snapshot, cmp_manager, timings).
+    """
+    timings = {}
 
-    try:
-        gtts = kite.get_gtts()
-    except Exception as e:
-        logging.error(f"Error fetching GTTs: {e}")
-        gtts = []
+    def stage(name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with timed(f"bootstrap:{name}"):
+                return fn(*args, **kwargs)
+        finally:
+            timings[name] = time.perf_counter() - start
 
-    # Initialize CMPManager and refresh cache
-    cmp_manager = CMPManager(csv_path="data/Name-symbol-mapping.csv")
-    cmp_manager.refresh_cache(holdings, gtts, scrips)
+    def fetch(snapshot, attr):
+        try:
+            return getattr(snapshot, attr)
+        except Exception as e:
+            logging.error(f"Error fetching {attr}: {e}")
+            return []
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        session_future = pool.submit(stage, "session", get_kite_session)
+        scrips_future = pool.submit(stage, "entry_levels", read_csv, csv_path)
+        pool.submit(stage, "instrument_index", lambda: get_instrument_index(mapping_path).load())
+        cmp_manager = stage("cmp_store", CMPManager, csv_path=mapping_path, store_path=store_path,
+                            cache_capacity=cache_capacity)
+
+        scrips = scrips_future.result()
+        prefetches = [pool.submit(stage, "quotes:entry_levels", cmp_manager.prefetch, entry_levels=scrips)]
+
+        kite = session_future.result()
+        snapshot = PortfolioSnapshot(kite)
+        sources = {
+            pool.submit(stage, "holdings", fetch, snapshot, "holdings"): "holdings",
+            pool.submit(stage, "gtts", fetch, snapshot, "gtts"): "gtts",
+        }
+        fetched = {}
+        for future in as_completed(sources):
+            name = sources[future]
+            fetched[name] = future.result()
+            prefetches.append(pool.submit(stage, f"quotes:{name}", cmp_manager.prefetch, **{name: fetched[name]}))
+        for future in prefetches:
+            future.result()
+
+    # Everything is prefetched; this only records the tracked symbol set
+    stage("refresh_cache", cmp_manager.refresh_cache, fetched["holdings"], fetched["gtts"], scrips)
+    timings["total"] = time.perf_counter() - start
+    return kite, scrips, snapshot, cmp_manager, timings
+
+
+def print_timings(timings):
+    print("\n⏱️ Startup timings:")
+    for name, seconds in timings.items():
+        print(f"  {name:<24} {seconds:>7.3f}s")
+
+
+def main(dry_run=None, cache_capacity=None):
+    init_environment()
+    install_exit_hook()
+    kite, scrips, snapshot, cmp_manager, timings = bootstrap(cache_capacity=cache_capacity)
+    print_timings(timings)
+    cmp_manager.start_background_refresh()
+    quote_stream = None
+    if CMP_STREAMING:
+        from .quote_stream import QuoteStream
+        quote_stream = QuoteStream(kite, cmp_manager)
+        quote_stream.start()
     #cmp_manager.print_all_cmps()
+    snapshot_fresh = True  # bootstrap just fetched holdings and GTTs
 
     while True:
         print("\nMenu:")
@@ -590,17 +589,31 @@ def main():
         print("5. Exit")
         choice = input("Enter your choice: ")
 
+        # Orders may have filled or been edited on Kite since the last action
+        if choice in ("1", "2", "3", "4"):
+            if snapshot_fresh:
+                snapshot_fresh = False
+            else:
+                snapshot.invalidate(holdings=True, gtts=True)
+
         if choice == "1":
-            detect_duplicate_symbols(scrips)
-            list_gtt_orders(kite, scrips, cmp_manager)
+            with timed("menu:list_gtt_orders"):
+                detect_duplicate_symbols(scrips)
+                list_gtt_orders(kite, scrips, cmp_manager, snapshot, dry_run=dry_run)
         elif choice == "2":
-            analyze_gtt_orders(kite, cmp_manager)
+            with timed("menu:analyze_gtt_orders"):
+                analyze_gtt_orders(kite, cmp_manager, snapshot)
         elif choice == "3":
-            analyze_holdings(kite, cmp_manager)
+            with timed("menu:analyze_holdings"):
+                analyze_holdings(kite, cmp_manager, snapshot)
         elif choice == "4":
-            analyze_roi_trend()
+            with timed("menu:analyze_roi_trend"):
+                analyze_roi_trend(snapshot=snapshot)
         elif choice == "5":
             print("Exiting...")
+            cmp_manager.stop_background_refresh()
+            if quote_stream is not None:
+                quote_stream.stop()
             break
         else:
             print("Invalid choice. Please try again.")
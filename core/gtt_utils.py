@@ -1,11 +1,275 @@
 import logging
-
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import logging
 
-def sync_gtt_orders(kite, gtt_plan, dry_run=False):
+# Kite allows 10 order requests per second; stay just under it
+KITE_ORDER_RATE_LIMIT = 8
+PLACE_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled on each attempt
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_transient_error(exc, idempotent=True):
+    """
+    True if exc is worth retrying. For a call that is not idempotent (placing
+    a GTT) only errors where the request never took effect count: failed
+    connects and 429s. A read timeout or gateway error may come after Kite
+    has already placed it.
+    """
+    import requests
+    from kiteconnect import exceptions
+    if not idempotent:
+        if isinstance(exc, requests.exceptions.ConnectionError):  # includes ConnectTimeout
+            return True
+        return isinstance(exc, exceptions.NetworkException) and (
+            getattr(exc, "code", None) == 429 or "too many requests" in str(exc).lower())
+    # Kite raises NetworkException for timeouts, 429 and 5xx gateway errors
+    return isinstance(exc, (
+        exceptions.NetworkException,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+    ))
+
+
+def call_with_retry(fn, retries=PLACE_RETRIES, backoff=RETRY_BACKOFF, limiter=None, idempotent=True,
+                    applied=None):
+    """
+    Call fn(), retrying transient errors with jittered exponential backoff.
+    Returns (result, attempts); re-raises the last error when out of retries.
+
+    idempotent=False only retries errors where fn certainly did not take
+    effect. After an ambiguous one (e.g. a read timeout), applied() is asked
+    first: it returns fn's result if the call went through anyway, or None
+    to retry. Without applied, ambiguous errors are not retried.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn(), attempt
+        except Exception as e:
+            ambiguous = not is_transient_error(e, idempotent)
+            if attempt > retries or not is_transient_error(e) or (ambiguous and applied is None):
+                e.attempts = attempt
+                raise
+            if ambiguous:
+                try:
+                    result = applied()
+                except Exception as check_error:
+                    logging.error(f"Could not check whether the call went through ({check_error}); not retrying")
+                    e.attempts = attempt
+                    raise e
+                if result is not None:
+                    logging.warning(f"Call went through despite the error ({e}); not retrying")
+                    return result, attempt
+            delay = backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            logging.warning(f"Transient error ({e}); retry {attempt}/{retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def _gtt_orders(kite, order):
+    return [{
+        "transaction_type": kite.TRANSACTION_TYPE_BUY,
+        "quantity": order["qty"],
+        "order_type": kite.ORDER_TYPE_LIMIT,
+        "product": kite.PRODUCT_CNC,
+        "price": order["price"]
+    }]
+
+
+def _find_placed_gtt(kite, symbol, order):
+    """The active BUY GTT on Kite matching order for symbol, if any."""
+    for gtt in kite.get_gtts():
+        if (gtt["status"] == "active" and gtt["condition"]["tradingsymbol"] == symbol
+                and gtt["orders"][0]["transaction_type"] == kite.TRANSACTION_TYPE_BUY
+                and _gtt_matches(gtt, order)):
+            return gtt
+    return None
+
+
+def _apply_op(kite, op, limiter, retries):
+    symbol = op["symbol"]
+    order = op.get("order")
+
+    idempotent, applied = True, None
+    if op["op"] == "place":
+        status = "placed"
+        # A retried place after a lost response would leave two GTTs
+        idempotent = False
+
+        def applied():
+            gtt = _find_placed_gtt(kite, symbol, order)
+            return {"trigger_id": gtt["id"]} if gtt else None
+
+        def call():
+            return kite.place_gtt(
+                trigger_type=kite.GTT_TYPE_SINGLE,
+                tradingsymbol=symbol,
+                exchange=order["exchange"],
+                trigger_values=[order["trigger"]],
+                last_price=order["ltp"],
+                orders=_gtt_orders(kite, order)
+            )
+    elif op["op"] == "modify":
+        status = "modified"
+
+        def call():
+            return kite.modify_gtt(
+                trigger_id=op["gtt_id"],
+                trigger_type=kite.GTT_TYPE_SINGLE,
+                tradingsymbol=symbol,
+                exchange=order["exchange"],
+                trigger_values=[order["trigger"]],
+                last_price=order["ltp"],
+                orders=_gtt_orders(kite, order)
+            )
+    else:
+        status = "deleted"
+
+        def call():
+            return kite.delete_gtt(op["gtt_id"])
+
+    start = time.perf_counter()
+    try:
+        response, attempts = call_with_retry(call, retries=retries, limiter=limiter,
+                                             idempotent=idempotent, applied=applied)
+        result = {
+            "symbol": symbol,
+            "status": status,
+            "trigger_id": (response or {}).get("trigger_id", op.get("gtt_id")),
+            "attempts": attempts,
+        }
+    except Exception as e:
+        logging.error(f"[ERROR] ❌ Failed to {op['op']} GTT for {symbol}: {e}")
+        result = {
+            "symbol": symbol,
+            "status": "failed",
+            "op": op["op"],
+            "error": str(e),
+            "attempts": getattr(e, "attempts", 1),
+        }
+    result["latency"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def apply_gtt_ops(kite, ops, max_workers=1, rate_limiter=None, retries=PLACE_RETRIES):
+    """Execute reconcile ops; returns one result dict per op, in order."""
+    limiter = rate_limiter or TokenBucket(KITE_ORDER_RATE_LIMIT)
+    if max_workers > 1 and len(ops) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda op: _apply_op(kite, op, limiter, retries), ops))
+    return [_apply_op(kite, op, limiter, retries) for op in ops]
+
+
+def _gtt_matches(gtt, order):
+    leg = gtt["orders"][0]
+    return (
+        round(gtt["condition"]["trigger_values"][0], 2) == round(order["trigger"], 2)
+        and round(leg["price"], 2) == round(order["price"], 2)
+        and leg["quantity"] == order["qty"]
+    )
+
+
+def reconcile_gtt_orders(existing_orders, gtt_plan, modify=True, prune=False, prune_symbols=None):
+    """
+    Diff BUY GTTs against the desired plan and return the minimal ops list.
+    Existing GTTs are hashed by symbol, so the diff is O(plan + gtts).
+    Each op is {"op": "place"|"modify"|"delete"|"skip", "symbol", ...}.
+    Only the first plan entry per symbol is used; repeats are skipped.
+
+    modify: active GTTs whose trigger/price/qty differ are modified in place;
+            otherwise any existing GTT for the symbol just skips it.
+    prune:  delete duplicate active GTTs, and active GTTs for symbols in
+            prune_symbols that are not in the plan. prune_symbols should
+            be the entry_levels symbols evaluated with a valid CMP; symbols
+            that fell out of the plan for any other reason are never pruned.
+    """
+    by_symbol = {}
+    for g in existing_orders:
+        by_symbol.setdefault(g["condition"]["tradingsymbol"], []).append(g)
+
+    ops = []
+    planned = {}
+    for order in gtt_plan:
+        # Duplicate entry_levels rows must not place a second GTT; the first row wins
+        if order["symbol"] in planned:
+            logging.warning(f"Duplicate plan entry for {order['symbol']}; keeping the first")
+            ops.append({"op": "skip", "symbol": order["symbol"], "reason": "duplicate"})
+            continue
+        planned[order["symbol"]] = [order]
+
+    for symbol, orders in planned.items():
+        existing = by_symbol.get(symbol, [])
+        if existing and not modify:
+            ops.extend({"op": "skip", "symbol": symbol, "reason": "exists"} for _ in orders)
+            continue
+        for i, order in enumerate(orders):
+            if i >= len(existing):
+                ops.append({"op": "place", "symbol": symbol, "order": order})
+                continue
+            g = existing[i]
+            if g["status"] != "active":
+                ops.append({"op": "skip", "symbol": symbol, "reason": g["status"]})
+            elif _gtt_matches(g, order):
+                ops.append({"op": "skip", "symbol": symbol, "reason": "unchanged"})
+            else:
+                ops.append({"op": "modify", "symbol": symbol, "gtt_id": g["id"], "order": order})
+        if prune:
+            for g in existing[len(orders):]:
+                if g["status"] == "active":
+                    ops.append({"op": "delete", "symbol": symbol, "gtt_id": g["id"]})
+
+    if prune and prune_symbols:
+        for symbol, existing in by_symbol.items():
+            if symbol in planned or symbol not in prune_symbols:
+                continue
+            for g in existing:
+                if g["status"] == "active":
+                    ops.append({"op": "delete", "symbol": symbol, "gtt_id": g["id"]})
+
+    return ops
+
+
+def sync_gtt_orders(kite, gtt_plan, dry_run=False, snapshot=None, max_workers=1,
+                    rate_limiter=None, retries=PLACE_RETRIES, reconcile=False, prune=False,
+                    prune_symbols=None):
+    """
+    Bring Zerodha BUY GTTs in line with gtt_plan.
+    By default only places GTTs for symbols without one; with reconcile=True
+    differing GTTs are modified in place, and prune=True also deletes GTTs
+    not in the plan (only among prune_symbols). Calls run on a thread pool when max_workers > 1, all
+    through a shared token bucket so the broker's order rate is respected.
+    Returns a report: {"placed", "modified", "deleted", "skipped", "failed"}.
+    """
     # Fetch all GTTs
-    all_gtts = kite.get_gtts()
+    all_gtts = snapshot.gtts if snapshot is not None else kite.get_gtts()
 
     # Filter out GTTs that are triggered and not triggered today
     today = datetime.today().date()
@@ -25,33 +289,37 @@ def sync_gtt_orders(kite, gtt_plan, dry_run=False):
                     continue
         existing_orders.append(g)
 
-    for order in gtt_plan:
-        symbol = order["symbol"]
-        existing = [
-            g for g in existing_orders
-            if g["condition"]["tradingsymbol"] == symbol and
-               g["orders"][0]["transaction_type"] == kite.TRANSACTION_TYPE_BUY
-        ]
-
-        if existing:
-            logging.debug(f"[INFO] Skipping {symbol}, GTT already exists")
+    report = {"placed": [], "modified": [], "deleted": [], "skipped": [], "failed": []}
+    to_apply = []
+    for op in reconcile_gtt_orders(existing_orders, gtt_plan, modify=reconcile, prune=prune,
+                                   prune_symbols=prune_symbols):
+        symbol = op["symbol"]
+        if op["op"] == "skip":
+            logging.debug(f"[INFO] Skipping {symbol}, GTT already exists ({op['reason']})")
+            report["skipped"].append({"symbol": symbol, "reason": op["reason"]})
+            continue
+        if op["op"] == "place":
+            logging.info(f"[INFO] ✅ Placing new GTT for {symbol} @ {op['order']['price']}")
+        elif op["op"] == "modify":
+            logging.info(f"[INFO] ✏️ Modifying GTT {op['gtt_id']} for {symbol} @ {op['order']['price']}")
         else:
-            logging.info(f"[INFO] ✅ Placing new GTT for {symbol} @ {order['price']}")
-            if not dry_run:
-                try:
-                    kite.place_gtt(
-                        trigger_type=kite.GTT_TYPE_SINGLE,
-                        tradingsymbol=symbol,
-                        exchange=order["exchange"],
-                        trigger_values=[order["trigger"]],
-                        last_price=order["ltp"],
-                        orders=[{
-                            "transaction_type": kite.TRANSACTION_TYPE_BUY,
-                            "quantity": order["qty"],
-                            "order_type": kite.ORDER_TYPE_LIMIT,
-                            "product": kite.PRODUCT_CNC,
-                            "price": order["price"]
-                        }]
-                    )
-                except Exception as e:
-                    logging.error(f"[ERROR] ❌ Failed to place GTT for {symbol}: {e}")
+            logging.info(f"[INFO] 🗑️ Deleting GTT {op['gtt_id']} for {symbol}")
+        if dry_run:
+            report["skipped"].append({"symbol": symbol, "reason": "dry_run", "op": op["op"]})
+        else:
+            to_apply.append(op)
+
+    results = apply_gtt_ops(kite, to_apply, max_workers=max_workers,
+                            rate_limiter=rate_limiter, retries=retries)
+    for result in results:
+        report[result["status"]].append(result)
+
+    if snapshot is not None and len(results) > len(report["failed"]):
+        snapshot.invalidate(holdings=False, gtts=True)
+
+    logging.info(
+        f"GTT sync: {len(report['placed'])} placed, {len(report['modified'])} modified, "
+        f"{len(report['deleted'])} deleted, {len(report['skipped'])} skipped, "
+        f"{len(report['failed'])} failed"
+    )
+    return report
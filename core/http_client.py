@@ -0,0 +1,215 @@
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlparse
+from .instrumentation import metrics, timed, record_response
+
+HTTP_TIMEOUT = 10  # seconds, per request
+HTTP_POOL_SIZE = 16  # keep-alive connections per host
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5  # seconds, doubled on each attempt
+HTTP_MAX_BACKOFF = 8
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Consecutive failures that open a host's circuit, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30  # seconds
+
+
+class CircuitOpenError(IOError):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+class _HostState:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+        self.failures = 0  # consecutive, drives the breaker
+        self.circuit_opens = 0
+        self.open_until = 0.0
+        self.probing = False
+
+
+class HttpClient:
+    """
+    One pooled requests.Session for all data-API calls, with per-request
+    timeouts, jittered exponential backoff on 429/5xx and connection
+    errors (honouring Retry-After), and a per-host circuit breaker: after
+    BREAKER_THRESHOLD consecutive failures the host is short-circuited for
+    BREAKER_RESET seconds, then a single probe request decides whether it
+    closes again. stats() reports per-host requests, retries and
+    connections opened.
+    """
+
+    def __init__(self, pool_maxsize=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF,
+                 max_backoff=HTTP_MAX_BACKOFF, breaker_threshold=BREAKER_THRESHOLD, breaker_reset=BREAKER_RESET):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._session = None
+        self._adapter = None
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize)
+                self._session = requests.Session()
+                self._session.mount("https://", self._adapter)
+                self._session.mount("http://", self._adapter)
+            return self._session
+
+    def _host(self, host):
+        with self._lock:
+            return self._hosts.setdefault(host, _HostState())
+
+    def _admit(self, host, state):
+        with self._lock:
+            if state.open_until == 0:
+                return
+            if time.monotonic() < state.open_until or state.probing:
+                raise CircuitOpenError(f"Circuit open for {host}; not sending request")
+            # Half-open: let exactly one request through to test the host
+            state.probing = True
+
+    def _record(self, state, ok):
+        with self._lock:
+            state.probing = False
+            if ok:
+                state.failures = 0
+                state.open_until = 0.0
+                return
+            state.errors += 1
+            state.failures += 1
+            if state.failures >= self.breaker_threshold:
+                if state.open_until == 0:
+                    state.circuit_opens += 1
+                state.open_until = time.monotonic() + self.breaker_reset
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return min(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5), self.max_backoff)
+
+    def request(self, method, url, endpoint=None, retries=None, **kwargs):
+        """
+        Send a request and return the final response. Retryable statuses
+        are returned as-is once retries run out; connection errors and
+        timeouts are re-raised. endpoint names the call in the API metrics.
+        """
+        import requests
+        host = urlparse(url).netloc
+        state = self._host(host)
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault("timeout", self.timeout)
+        endpoint = endpoint or f"http:{host}"
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit(host, state)
+            with self._lock:
+                state.requests += 1
+            response = None
+            try:
+                with timed(endpoint) as info:
+                    response = self.session.request(method, url, **kwargs)
+                    record_response(info, response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(state, ok=False)
+                if attempt > retries:
+                    raise
+                delay = self._delay(attempt)
+                logging.warning(f"{method} {host} failed ({e}); retry {attempt}/{retries} in {delay:.2f}s")
+            except Exception:
+                # Anything else (e.g. ChunkedEncodingError) still ends a half-open probe
+                self._record(state, ok=False)
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self._record(state, ok=True)
+                    return response
+                if response.status_code == 429:
+                    with self._lock:
+                        state.throttled += 1
+                self._record(state, ok=False)
+                if attempt > retries:
+                    return response
+                delay = self._delay(attempt, response)
+                logging.warning(f"{method} {host} returned {response.status_code}; "
+                                f"retry {attempt}/{retries} in {delay:.2f}s")
+            with self._lock:
+                state.retries += 1
+            time.sleep(delay)
+
+    def get(self, url, endpoint=None, **kwargs):
+        return self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    def post(self, url, endpoint=None, **kwargs):
+        return self.request("POST", url, endpoint=endpoint, **kwargs)
+
+    def _connections_by_host(self):
+        counts = {}
+        if self._adapter is None:
+            return counts
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            counts[host] = counts.get(host, 0) + pool.num_connections
+        return counts
+
+    def stats(self):
+        connections = self._connections_by_host()
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "requests": s.requests,
+                    "retries": s.retries,
+                    "throttled": s.throttled,
+                    "errors": s.errors,
+                    "connections": connections.get(host, 0),
+                    "circuit_opens": s.circuit_opens,
+                    "circuit": "open" if s.open_until > now else ("half-open" if s.open_until else "closed"),
+                }
+                for host, s in self._hosts.items()
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats:
+            return
+        print("\n🌐 HTTP hosts:")
+        print(f"{'Host':<32} {'Requests':>8} {'Retries':>8} {'429s':>6} {'Errors':>7} {'Conns':>6} {'Circuit':>10}")
+        for host, s in sorted(stats.items()):
+            print(f"{host:<32} {s['requests']:>8} {s['retries']:>8} {s['throttled']:>6} {s['errors']:>7} "
+                  f"{s['connections']:>6} {s['circuit']:>10}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+            metrics.register_section("http_hosts", _client.stats, _client.print_stats)
+        return _client
@@ -0,0 +1,97 @@
+import os
+import logging
+import threading
+
+
+class InstrumentIndex:
+    """
+    In-memory SYMBOL -> ISIN index over the Name-symbol-mapping CSV.
+    The CSV is parsed once and only re-read when its mtime changes.
+    Instrument keys are built per exchange segment, e.g. "NSE_EQ|INE002A01018".
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self._isin_by_symbol = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        import pandas as pd
+        df = pd.read_csv(self.csv_path, dtype=str)
+        df.columns = [col.strip() for col in df.columns]
+        df = df.dropna(subset=["SYMBOL", "ISIN NUMBER"])
+        symbols = df["SYMBOL"].str.strip().str.upper()
+        isins = df["ISIN NUMBER"].str.strip()
+        # Keep the first row per symbol, same as the old iloc[0] lookup
+        index = {}
+        for symbol, isin in zip(symbols, isins):
+            index.setdefault(symbol, isin)
+        return index
+
+    def _ensure_loaded(self):
+        try:
+            mtime = os.path.getmtime(self.csv_path)
+        except OSError as e:
+            logging.error(f"Instrument mapping CSV not accessible: {e}")
+            return False
+
+        if mtime == self._mtime:
+            return True
+
+        with self._lock:
+            if mtime == self._mtime:
+                return True
+            try:
+                self._isin_by_symbol = self._load()
+                self._mtime = mtime
+                logging.debug(f"Loaded {len(self._isin_by_symbol)} symbols from {self.csv_path}")
+            except Exception as e:
+                logging.error(f"Error reading CSV or building instrument index: {e}")
+                return False
+        return True
+
+    def load(self):
+        """Parse the CSV now (if changed) rather than on the first lookup."""
+        return self._ensure_loaded()
+
+    def get_isin(self, symbol):
+        if not self._ensure_loaded():
+            return None
+        return self._isin_by_symbol.get(symbol.upper())
+
+    def resolve(self, symbol, segment="NSE_EQ"):
+        isin = self.get_isin(symbol)
+        if isin is None:
+            return None
+        return f"{segment}|{isin}"
+
+    def resolve_many(self, symbols, segment="NSE_EQ"):
+        """
+        Resolve many symbols to instrument keys for one segment.
+        Returns {symbol: instrument_key}; unknown symbols are left out.
+        """
+        if not self._ensure_loaded():
+            return {}
+        index = self._isin_by_symbol
+        resolved = {}
+        for symbol in symbols:
+            isin = index.get(symbol.upper())
+            if isin is not None:
+                resolved[symbol] = f"{segment}|{isin}"
+        return resolved
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_instrument_index(csv_path: str) -> InstrumentIndex:
+    """Return the process-wide index for csv_path, creating it on first use."""
+    key = os.path.abspath(csv_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = InstrumentIndex(csv_path)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# KiteConnect methods that hit the network
+KITE_ENDPOINTS = {
+    "profile", "holdings", "positions", "trades", "orders", "instruments", "quote", "ltp",
+    "get_gtts", "get_gtt", "place_gtt", "modify_gtt", "delete_gtt", "generate_session",
+}
+
+
+class Metrics:
+    """Thread-safe per-endpoint counts, latency histograms, bytes and errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._sections = {}
+
+    def register_section(self, name, snapshot_fn, print_fn=None):
+        """Add an extra block (e.g. per-host HTTP stats) to the summary and JSON export."""
+        with self._lock:
+            self._sections[name] = (snapshot_fn, print_fn)
+
+    def record(self, endpoint, latency, nbytes=0, error=None):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = {
+                    "count": 0, "errors": 0, "bytes": 0, "total_s": 0.0, "max_s": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS), "last_error": None,
+                }
+                self._stats[endpoint] = stats
+            stats["count"] += 1
+            stats["bytes"] += nbytes
+            stats["total_s"] += latency
+            stats["max_s"] = max(stats["max_s"], latency)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats["buckets"][i] += 1
+                    break
+            if error is not None:
+                stats["errors"] += 1
+                stats["last_error"] = str(error)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    @staticmethod
+    def _percentile(stats, q):
+        # Upper bound of the bucket holding the q-th sample
+        target = q * stats["count"]
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, stats["buckets"]):
+            seen += n
+            if seen >= target:
+                return min(bound, stats["max_s"])
+        return stats["max_s"]
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                result[endpoint] = {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "bytes": stats["bytes"],
+                    "total_s": round(stats["total_s"], 4),
+                    "avg_s": round(stats["total_s"] / stats["count"], 4),
+                    "p50_s": round(self._percentile(stats, 0.5), 4),
+                    "p95_s": round(self._percentile(stats, 0.95), 4),
+                    "max_s": round(stats["max_s"], 4),
+                    "histogram": {
+                        ("inf" if bound == float("inf") else str(bound)): n
+                        for bound, n in zip(LATENCY_BUCKETS, stats["buckets"])
+                    },
+                    "last_error": stats["last_error"],
+                }
+            return result
+
+    def print_summary(self):
+        snap = self.snapshot()
+        if not snap:
+            return
+        print("\n📈 API call summary:")
+        print(f"{'Endpoint':<28} {'Calls':>6} {'Errors':>6} {'Total s':>9} {'Avg s':>8} "
+              f"{'p95 s':>8} {'Max s':>8} {'KB':>9}")
+        print("-" * 90)
+        for endpoint, s in sorted(snap.items(), key=lambda item: item[1]["total_s"], reverse=True):
+            print(f"{endpoint:<28} {s['count']:>6} {s['errors']:>6} {s['total_s']:>9.3f} {s['avg_s']:>8.3f} "
+                  f"{s['p95_s']:>8.3f} {s['max_s']:>8.3f} {s['bytes'] / 1024:>9.1f}")
+        for _, print_fn in list(self._sections.values()):
+            if print_fn is not None:
+                print_fn()
+
+    def export_json(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = self.snapshot()
+        for name, (snapshot_fn, _) in list(self._sections.items()):
+            data[name] = snapshot_fn()
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        logging.info(f"API metrics written to {path}")
+
+
+metrics = Metrics()
+_local = threading.local()
+
+
+@contextmanager
+def timed(endpoint):
+    """
+    Time the enclosed block as one call to endpoint. The yielded dict can
+    carry "bytes"; exceptions are recorded as errors and re-raised.
+    """
+    info = {"bytes": 0}
+    start = time.perf_counter()
+    try:
+        yield info
+    except Exception as e:
+        metrics.record(endpoint, time.perf_counter() - start, info["bytes"], error=e)
+        raise
+    metrics.record(endpoint, time.perf_counter() - start, info["bytes"])
+
+
+def record_response(info, response):
+    """Add an HTTP response's body size to a timed() block."""
+    info["bytes"] += len(response.content or b"")
+
+
+def _count_kite_bytes(response, *args, **kwargs):
+    if getattr(_local, "kite_bytes", None) is not None:
+        _local.kite_bytes += len(response.content or b"")
+
+
+class InstrumentedKite:
+    """
+    Proxy around KiteConnect that times every network-bound method. When a
+    call fails with TokenException and on_token_error is set, it is called
+    with the rejected token; if it returns True (a new token is in place)
+    the call is retried once.
+    """
+
+    def __init__(self, kite, on_token_error=None):
+        object.__setattr__(self, "_kite", kite)
+        object.__setattr__(self, "_on_token_error", on_token_error)
+        session = getattr(kite, "reqsession", None)
+        if session is not None and _count_kite_bytes not in session.hooks["response"]:
+            session.hooks["response"].append(_count_kite_bytes)
+
+    def __getattr__(self, name):
+        attr = getattr(self._kite, name)
+        if name not in KITE_ENDPOINTS or not callable(attr):
+            return attr
+
+        def timed_call(fn, *args, **kwargs):
+            _local.kite_bytes = 0
+            try:
+                with timed(f"kite:{name}") as info:
+                    try:
+                        return fn(*args, **kwargs)
+                    finally:
+                        info["bytes"] = _local.kite_bytes
+            finally:
+                _local.kite_bytes = None
+
+        def call(*args, **kwargs):
+            token = getattr(self._kite, "access_token", None)
+            try:
+                return timed_call(attr, *args, **kwargs)
+            except Exception as e:
+                if self._on_token_error is None or name == "generate_session":
+                    raise
+                from kiteconnect import exceptions
+                if not isinstance(e, exceptions.TokenException) or not self._on_token_error(token):
+                    raise
+            return timed_call(getattr(self._kite, name), *args, **kwargs)
+
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._kite, name, value)
+
+
+def instrument_kite(kite, on_token_error=None):
+    if isinstance(kite, InstrumentedKite):
+        if on_token_error is not None:
+            object.__setattr__(kite, "_on_token_error", on_token_error)
+        return kite
+    return InstrumentedKite(kite, on_token_error)
+
+
+_exit_hook_installed = False
+
+
+def install_exit_hook():
+    """
+    On exit, print the summary when TRADECRAFT_METRICS=1 and/or write it as
+    JSON to TRADECRAFT_METRICS_JSON.
+    """
+    global _exit_hook_installed
+    if _exit_hook_installed:
+        return
+    _exit_hook_installed = True
+
+    def report():
+        if os.getenv("TRADECRAFT_METRICS", "").lower() in ("1", "true", "yes"):
+            metrics.print_summary()
+        path = os.getenv("TRADECRAFT_METRICS_JSON")
+        if path:
+            metrics.export_json(path)
+
+    atexit.register(report)
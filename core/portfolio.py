@@ -0,0 +1,95 @@
+import logging
+import threading
+
+
+def normalize_symbol(symbol):
+    return symbol.replace("#", "").upper()
+
+
+class PortfolioSnapshot:
+    """
+    Session-wide view of Kite holdings (incl. T1 quantities) and GTTs.
+    Each is fetched once on first use and indexed by normalized symbol.
+    Call invalidate() after placing, modifying or deleting orders.
+    Holdings and GTTs have separate locks so both can be fetched at once.
+    """
+
+    def __init__(self, kite):
+        self.kite = kite
+        self._holdings_lock = threading.RLock()
+        self._gtts_lock = threading.RLock()
+        self._holdings = None
+        self._holdings_by_symbol = None
+        self._gtts = None
+        self._buy_gtts_by_symbol = None
+
+    @property
+    def holdings(self):
+        with self._holdings_lock:
+            if self._holdings is None:
+                holdings = self.kite.holdings()
+                self._holdings_by_symbol = {}
+                for h in holdings:
+                    self._holdings_by_symbol.setdefault(normalize_symbol(h["tradingsymbol"]), h)
+                self._holdings = holdings
+                logging.debug(f"Portfolio snapshot: fetched {len(holdings)} holdings")
+            return self._holdings
+
+    @property
+    def gtts(self):
+        with self._gtts_lock:
+            if self._gtts is None:
+                gtts = self.kite.get_gtts()
+                self._buy_gtts_by_symbol = {}
+                for g in gtts:
+                    if g["orders"][0]["transaction_type"] != self.kite.TRANSACTION_TYPE_BUY:
+                        continue
+                    symbol = normalize_symbol(g["condition"]["tradingsymbol"])
+                    self._buy_gtts_by_symbol.setdefault(symbol, []).append(g)
+                self._gtts = gtts
+                logging.debug(f"Portfolio snapshot: fetched {len(gtts)} GTTs")
+            return self._gtts
+
+    def holding(self, symbol, exchange=None):
+        with self._holdings_lock:
+            self.holdings
+            h = self._holdings_by_symbol.get(normalize_symbol(symbol))
+        if h is not None and exchange is not None and h["exchange"] != exchange:
+            return None
+        return h
+
+    def held_qty(self, symbol):
+        """Holdings quantity plus T1 quantity, 0 when not held."""
+        h = self.holding(symbol)
+        if h is None:
+            return 0
+        return h["quantity"] + h.get("t1_quantity", 0)
+
+    def holdings_qty_map(self):
+        with self._holdings_lock:
+            self.holdings
+            return {
+                symbol: h["quantity"] + h.get("t1_quantity", 0)
+                for symbol, h in self._holdings_by_symbol.items()
+            }
+
+    def buy_gtts(self, symbol=None):
+        with self._gtts_lock:
+            self.gtts
+            if symbol is None:
+                return [g for gtts in self._buy_gtts_by_symbol.values() for g in gtts]
+            return self._buy_gtts_by_symbol.get(normalize_symbol(symbol), [])
+
+    def has_buy_gtt(self, symbol):
+        return bool(self.buy_gtts(symbol))
+
+    def invalidate(self, holdings=True, gtts=True):
+        if holdings:
+            with self._holdings_lock:
+                self._holdings = None
+                self._holdings_by_symbol = None
+        if gtts:
+            with self._gtts_lock:
+                self._gtts = None
+                self._buy_gtts_by_symbol = None
+        logging.debug(f"Portfolio snapshot invalidated (holdings={holdings}, gtts={gtts})")
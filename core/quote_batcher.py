@@ -0,0 +1,77 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+BATCH_WINDOW = 0.01  # seconds to wait for more misses before fetching
+MAX_BATCH = 500  # Upstox accepts up to 500 instrument keys per request
+
+
+class QuoteBatcher:
+    """
+    Merges single-symbol quote lookups. Concurrent requests for the same
+    (exchange, symbol) share one in-flight future; distinct keys that arrive
+    within `window` seconds are fetched together with one
+    fetch_many(keys) -> {key: value} call. Keys missing from the result
+    resolve to None; if fetch_many raises, every waiting future gets the
+    exception.
+    """
+
+    def __init__(self, fetch_many, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.fetch_many = fetch_many
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future, until its batch completes
+        self._pending = []  # keys waiting for the next flush
+        self._timer = None
+        self.stats = {"requests": 0, "coalesced": 0, "batches": 0, "keys_fetched": 0}
+
+    def submit(self, exchange, symbol):
+        key = (exchange, symbol)
+        flush_now = False
+        with self._lock:
+            self.stats["requests"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            future = Future()
+            self._inflight[key] = future
+            self._pending.append(key)
+            if len(self._pending) >= self.max_batch:
+                flush_now = True
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+        return future
+
+    def get(self, exchange, symbol, timeout=None):
+        return self.submit(exchange, symbol).result(timeout)
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            keys, self._pending = self._pending, []
+            if not keys:
+                return
+            self.stats["batches"] += 1
+            self.stats["keys_fetched"] += len(keys)
+
+        logging.debug(f"Fetching {len(keys)} coalesced quote lookups in one call")
+        try:
+            results, error = self.fetch_many(keys) or {}, None
+        except Exception as e:
+            results, error = {}, e
+
+        with self._lock:
+            futures = [self._inflight.pop(key) for key in keys]
+        for key, future in zip(keys, futures):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results.get(key))
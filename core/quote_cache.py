@@ -0,0 +1,160 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from .instrumentation import metrics
+
+QUOTE_CACHE_CAPACITY = 5000  # entries; well above a full watchlist plus holdings
+QUOTE_TTL = 600  # seconds, 10 minutes
+
+
+class QuoteCache:
+    """
+    Bounded quote cache keyed by (exchange, symbol). Entries carry their
+    fetch time and expire after `ttl` seconds; once `capacity` is reached
+    the least recently used entry is evicted. Owners of a tracked symbol
+    set call reserve() so the capacity never drops below it. get() counts hits, misses
+    (absent or expired) and evictions for tuning; allow_stale=True returns
+    an expired entry so callers can serve it while they revalidate.
+    """
+
+    def __init__(self, capacity=QUOTE_CACHE_CAPACITY, ttl=QUOTE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (quote, fetched_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale_served = 0
+        self.evictions = 0
+
+    def _fresh(self, fetched_at, now):
+        return (now - fetched_at) < self.ttl
+
+    def get(self, key, allow_stale=False):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            quote, fetched_at = entry
+            self._entries.move_to_end(key)
+            if self._fresh(fetched_at, now):
+                self.hits += 1
+                return quote
+            if allow_stale:
+                self.stale_served += 1
+                return quote
+            self.misses += 1
+            self.expired += 1
+            return None
+
+    def peek(self, key):
+        """Current quote for key, expired or not, without touching LRU order or counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def fetched_at(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry else 0
+
+    def is_fresh(self, key, now=None):
+        return self._fresh(self.fetched_at(key), now or time.time())
+
+    def put(self, key, quote, fetched_at=None):
+        self.put_many({key: quote}, fetched_at)
+
+    def put_many(self, quote_map, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        with self._lock:
+            for key, quote in quote_map.items():
+                self._entries[key] = (quote, fetched_at)
+                self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, capacity):
+        with self._lock:
+            self.capacity = capacity
+            self._evict()
+
+    def reserve(self, n):
+        """Grow the capacity to at least n entries, e.g. the symbols a CMPManager tracks."""
+        with self._lock:
+            if n > self.capacity:
+                logging.info(f"Growing quote cache from {self.capacity} to {n} entries for the tracked symbols")
+                self.capacity = n
+
+    def items(self):
+        with self._lock:
+            return [(key, quote) for key, (quote, _) in self._entries.items()]
+
+    def entries(self):
+        """[(key, quote, fetched_at)] snapshot, oldest use first."""
+        with self._lock:
+            return [(key, quote, fetched_at) for key, (quote, fetched_at) in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale_served
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stale_served": self.stale_served,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def print_stats(self):
+        s = self.stats()
+        if not (s["hits"] or s["misses"] or s["stale_served"]):
+            return
+        hit_rate = f"{s['hit_rate']:.1%}" if s["hit_rate"] is not None else "N/A"
+        print("\n💾 Quote cache:")
+        size = f"{s['size']}/{s['capacity']}"
+        print(f"{'Size':>11} {'Hits':>8} {'Misses':>8} {'Expired':>8} {'Stale':>7} {'Evicted':>8} {'Hit rate':>9}")
+        print(f"{size:>11} {s['hits']:>8} {s['misses']:>8} {s['expired']:>8} "
+              f"{s['stale_served']:>7} {s['evictions']:>8} {hit_rate:>9}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_quote_cache(capacity=None):
+    """
+    Return the process-wide quote cache shared by get_cmp and CMPManager,
+    creating it on first use. A capacity resizes it.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QuoteCache(capacity or QUOTE_CACHE_CAPACITY)
+            metrics.register_section("quote_cache", _cache.stats, _cache.print_stats)
+        elif capacity:
+            _cache.resize(capacity)
+        return _cache
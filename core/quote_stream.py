@@ -0,0 +1,108 @@
+import logging
+import threading
+from kiteconnect import KiteTicker
+
+
+class QuoteStream:
+    """
+    Streams LTP ticks from the Kite ticker into a CMPManager.
+    Subscribes to every symbol the manager tracks and follows changes to
+    that set. root overrides the ticker URL, e.g. a local stand-in server.
+    """
+
+    def __init__(self, kite, cmp_manager, root=None, instrument_tokens=None):
+        self.kite = kite
+        self.cmp_manager = cmp_manager
+        self.root = root
+        self._token_by_key = dict(instrument_tokens or {})
+        self._key_by_token = {token: key for key, token in self._token_by_key.items()}
+        self._loaded_exchanges = set()
+        self._subscribed = set()
+        self._lock = threading.Lock()
+        self.ticker = None
+        self.ticks = 0
+
+    def _resolve_tokens(self, symbols):
+        missing_exchanges = {
+            exch for exch, sym in symbols
+            if (exch, sym) not in self._token_by_key and exch not in self._loaded_exchanges
+        }
+        for exch in missing_exchanges:
+            try:
+                for inst in self.kite.instruments(exch):
+                    key = (exch, inst["tradingsymbol"])
+                    self._token_by_key.setdefault(key, inst["instrument_token"])
+            except Exception as e:
+                logging.error(f"Could not load {exch} instruments for streaming: {e}")
+            self._loaded_exchanges.add(exch)
+
+        tokens = set()
+        for key in symbols:
+            token = self._token_by_key.get(key)
+            if token is None:
+                logging.warning(f"No instrument token for {key[1]} ({key[0]}); not streaming it")
+                continue
+            self._key_by_token[token] = key
+            tokens.add(token)
+        return tokens
+
+    def _on_ticks(self, ws, ticks):
+        updates = {}
+        for tick in ticks:
+            key = self._key_by_token.get(tick.get("instrument_token"))
+            if key is not None and tick.get("last_price"):
+                updates[key] = tick["last_price"]
+        if updates:
+            self.cmp_manager.apply_ticks(updates)
+            self.ticks += len(updates)
+
+    def _on_connect(self, ws, response):
+        with self._lock:
+            tokens = list(self._subscribed)
+        if tokens:
+            ws.subscribe(tokens)
+            ws.set_mode(ws.MODE_LTP, tokens)
+        logging.info(f"Quote stream connected; subscribed to {len(tokens)} instruments")
+
+    def _on_close(self, ws, code, reason):
+        logging.info(f"Quote stream closed: {code} {reason}")
+
+    def _on_error(self, ws, code, reason):
+        logging.error(f"Quote stream error: {code} {reason}")
+
+    def start(self, symbols=None):
+        symbols = self.cmp_manager._symbols if symbols is None else symbols
+        with self._lock:
+            self._subscribed = self._resolve_tokens(symbols)
+
+        self.ticker = KiteTicker(self.kite.api_key, self.kite.access_token, root=self.root)
+        self.ticker.on_ticks = self._on_ticks
+        self.ticker.on_connect = self._on_connect
+        self.ticker.on_close = self._on_close
+        self.ticker.on_error = self._on_error
+        self.cmp_manager.attach_stream(self)
+        self.ticker.connect(threaded=True)
+
+    def update_symbols(self, symbols):
+        """Resubscribe to match a new symbol set."""
+        with self._lock:
+            wanted = self._resolve_tokens(symbols)
+            added = list(wanted - self._subscribed)
+            removed = list(self._subscribed - wanted)
+            self._subscribed = wanted
+
+        if self.ticker is None or not self.ticker.is_connected():
+            return
+        if removed:
+            self.ticker.unsubscribe(removed)
+        if added:
+            self.ticker.subscribe(added)
+            self.ticker.set_mode(self.ticker.MODE_LTP, added)
+        if added or removed:
+            logging.info(f"Quote stream resubscribed: +{len(added)} -{len(removed)}")
+
+    def stop(self):
+        self.cmp_manager.attach_stream(None)
+        if self.ticker is not None:
+            self.ticker.close()
+            self.ticker = None
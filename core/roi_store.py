@@ -0,0 +1,287 @@
+import os
+import re
+import json
+import shutil
+import threading
+import logging
+import argparse
+import pandas as pd
+from .columnar import list_parts, read_part, write_part
+
+ROI_DIR = "data/roi"
+LEGACY_ROI_PATH = "data/roi-master.csv"
+
+# Longest trend window analyze_roi_trend can ask for without a rescan
+STREAK_WINDOW = 30
+
+ROI_COLUMNS = [
+    "Date", "Symbol", "Invested Amount", "Absolute Profit",
+    "Yield Per Day", "Age of Stock", "Profit Percentage", "ROI per day"
+]
+
+_PARTITION = re.compile(r"^(date|month)=(\d{4}-\d{2}(?:-\d{2})?)$")
+
+
+class RoiStore:
+    """
+    ROI history stored as one partition per day (date=YYYY-MM-DD), so
+    writing today only replaces one small partition. compact() folds
+    finished months into month=YYYY-MM partitions. Dates are kept as
+    YYYY-MM-DD strings, symbols upper-cased.
+
+    Alongside the partitions, _streaks.json keeps each symbol's last
+    max_window ROI/day values and its current up/down streak, updated on
+    every write_day so trend queries never scan the history.
+    """
+
+    def __init__(self, directory=ROI_DIR, legacy_path=LEGACY_ROI_PATH, max_window=STREAK_WINDOW):
+        self.directory = directory
+        self.max_window = max_window
+        self.streaks_path = os.path.join(directory, "_streaks.json")
+        self._lock = threading.Lock()
+        self._streaks = None
+        if legacy_path and os.path.exists(legacy_path) and not os.path.exists(directory):
+            self._import_legacy(legacy_path)
+
+    def _import_legacy(self, legacy_path):
+        logging.info(f"Importing {legacy_path} into {self.directory}")
+        df = self._normalize(pd.read_csv(legacy_path))
+        df = df.drop_duplicates(subset=["Date", "Symbol"], keep="last")
+        for month, part in df.groupby(df["Date"].str[:7]):
+            write_part(part, os.path.join(self.directory, f"month={month}"), name="part")
+        print(f"Imported {len(df)} ROI rows from {legacy_path} into the ROI store.")
+
+    @staticmethod
+    def _normalize(df):
+        df = df[ROI_COLUMNS].copy()
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m-%d")
+        df["Symbol"] = df["Symbol"].astype(str).str.upper()
+        return df.dropna(subset=["Date"])
+
+    def _partitions(self):
+        """[(kind, key, path)] in date order; a month sorts before its own days."""
+        if not os.path.isdir(self.directory):
+            return []
+        partitions = []
+        for name in os.listdir(self.directory):
+            match = _PARTITION.match(name)
+            if match:
+                partitions.append((match.group(1), match.group(2), os.path.join(self.directory, name)))
+        return sorted(partitions, key=lambda p: (p[1][:7], p[0] != "month", p[1]))
+
+    def write_day(self, df, date_str):
+        """
+        Merge df into the partition for date_str (YYYY-MM-DD) and rewrite
+        only that partition; rows for the same symbol are replaced.
+        """
+        df = self._normalize(df.assign(Date=date_str))
+        directory = os.path.join(self.directory, f"date={date_str}")
+        existing = [read_part(path) for path in list_parts(directory)]
+        if existing:
+            df = pd.concat(existing + [df], ignore_index=True)
+            df = df.drop_duplicates(subset=["Date", "Symbol"], keep="last")
+        # Replace the old parts only once the merged one is on disk
+        written = write_part(df, directory, name="part")
+        for path in list_parts(directory):
+            if os.path.abspath(path) != os.path.abspath(written):
+                os.remove(path)
+        self._update_streaks(df, date_str)
+
+    @staticmethod
+    def _in_range(kind, key, start, end):
+        if kind == "date":
+            return (start is None or key >= start) and (end is None or key <= end)
+        return (start is None or key >= start[:7]) and (end is None or key <= end[:7])
+
+    def _load(self, partitions, symbols, columns):
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(["Date", "Symbol"] + list(columns)))
+        filters = []
+        if symbols is not None:
+            symbols = sorted({s.upper() for s in symbols})
+            # pyarrow rejects an empty "in" list, and nothing could match anyway
+            if not symbols:
+                return pd.DataFrame(columns=read_columns or ROI_COLUMNS)
+            filters.append(("Symbol", "in", symbols))
+
+        frames = []
+        for kind, key, path in partitions:
+            for part in list_parts(path):
+                frames.append(read_part(part, columns=read_columns, filters=filters))
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=read_columns or ROI_COLUMNS)
+
+        df = pd.concat(frames, ignore_index=True)
+        # Day partitions are read last, so they win over a compacted month
+        df = df.drop_duplicates(subset=["Date", "Symbol"], keep="last")
+        for col in ROI_COLUMNS[2:]:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        return df
+
+    def read(self, start=None, end=None, symbols=None, columns=None):
+        """
+        Load ROI rows between start and end (inclusive, YYYY-MM-DD) for the
+        given symbols, touching only partitions that overlap the range.
+        """
+        partitions = [p for p in self._partitions() if self._in_range(p[0], p[1], start, end)]
+        df = self._load(partitions, symbols, columns)
+        if start is not None:
+            df = df[df["Date"] >= start]
+        if end is not None:
+            df = df[df["Date"] <= end]
+        if columns is not None:
+            df = df[list(columns)]
+        return df.reset_index(drop=True)
+
+    def recent(self, n_dates, symbols=None, columns=None):
+        """Rows for the latest n_dates dates, reading partitions newest first."""
+        # Walk back from the newest partition until enough dates are covered
+        needed = []
+        dates = set()
+        for partition in reversed(self._partitions()):
+            needed.insert(0, partition)
+            df = self._load([partition], symbols, ["Date"])
+            dates.update(df["Date"])
+            if len(dates) >= n_dates:
+                break
+        df = self._load(needed, symbols, columns)
+        latest = sorted(dates)[-n_dates:]
+        df = df[df["Date"].isin(latest)]
+        if columns is not None:
+            df = df[list(columns)]
+        return df.reset_index(drop=True)
+
+    def compact(self, before=None):
+        """
+        Merge day partitions of months before `before` (default: the current
+        month, YYYY-MM) into month partitions. Returns months compacted.
+        """
+        before = before or pd.Timestamp.today().strftime("%Y-%m")
+        by_month = {}
+        for kind, key, path in self._partitions():
+            if kind == "date" and key[:7] < before:
+                by_month.setdefault(key[:7], []).append(path)
+
+        for month, day_paths in sorted(by_month.items()):
+            month_dir = os.path.join(self.directory, f"month={month}")
+            frames = [read_part(p) for d in [month_dir] + day_paths for p in list_parts(d)]
+            df = pd.concat(frames, ignore_index=True)
+            df = df.drop_duplicates(subset=["Date", "Symbol"], keep="last").sort_values(["Date", "Symbol"])
+            write_part(df, month_dir, name="part")
+            for d in day_paths:
+                shutil.rmtree(d)
+            logging.info(f"Compacted {len(day_paths)} day partitions into {month_dir}")
+        return sorted(by_month)
+
+    # --- Streak state ----------------------------------------------------
+
+    @staticmethod
+    def _streak_lengths(values):
+        """Consecutive strict rises / falls ending at the latest value."""
+        up = down = 0
+        for prev, cur in zip(reversed(values[:-1]), reversed(values)):
+            if up == down == 0:
+                up, down = int(prev < cur), int(prev > cur)
+                if not (up or down):
+                    break
+            elif up and prev < cur:
+                up += 1
+            elif down and prev > cur:
+                down += 1
+            else:
+                break
+        return up, down
+
+    def _set_window(self, state, symbol, dates, values):
+        up, down = self._streak_lengths(values)
+        state[symbol] = {"dates": dates, "values": values, "up": up, "down": down}
+
+    def _save_streaks(self, state):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.streaks_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"max_window": self.max_window, "symbols": state}, f)
+        os.replace(tmp_path, self.streaks_path)
+
+    def rebuild_streaks(self):
+        """Recompute the streak state from the full history."""
+        df = self.read(columns=["Date", "Symbol", "ROI per day"]).sort_values(["Symbol", "Date"])
+        state = {}
+        for symbol, group in df.groupby("Symbol"):
+            group = group.tail(self.max_window)
+            self._set_window(state, symbol, group["Date"].tolist(), group["ROI per day"].tolist())
+        with self._lock:
+            self._save_streaks(state)
+            self._streaks = state
+        logging.info(f"Rebuilt ROI streaks for {len(state)} symbols")
+        return state
+
+    def streaks(self):
+        """{SYMBOL: {"dates", "values", "up", "down"}}, rebuilt if missing or stale."""
+        if self._streaks is None:
+            state = None
+            if os.path.exists(self.streaks_path):
+                with open(self.streaks_path) as f:
+                    saved = json.load(f)
+                if saved.get("max_window") == self.max_window:
+                    state = saved["symbols"]
+            self._streaks = state if state is not None else self.rebuild_streaks()
+        return self._streaks
+
+    def _update_streaks(self, df, date_str):
+        state = self.streaks()
+        backfilled = False
+        with self._lock:
+            for symbol, value in zip(df["Symbol"], pd.to_numeric(df["ROI per day"], errors="coerce")):
+                entry = state.get(symbol, {"dates": [], "values": []})
+                dates, values = entry["dates"], entry["values"]
+                if dates and date_str < dates[-1]:
+                    backfilled = True
+                    break
+                if dates and dates[-1] == date_str:
+                    # Same-day rewrite replaces the latest value
+                    values[-1] = float(value)
+                else:
+                    dates.append(date_str)
+                    values.append(float(value))
+                self._set_window(state, symbol, dates[-self.max_window:], values[-self.max_window:])
+            if not backfilled:
+                self._save_streaks(state)
+        if backfilled:
+            # Writing into the past can change any later window
+            self.rebuild_streaks()
+
+    def trending(self, n, direction="up", symbols=None):
+        """
+        Symbols whose last n ROI/day values strictly rise (or fall), as
+        {SYMBOL: values oldest to latest}. n may be anything up to max_window.
+        """
+        if not 1 <= n <= self.max_window:
+            raise ValueError(f"Trend window must be between 1 and {self.max_window}")
+        wanted = None if symbols is None else {s.upper() for s in symbols}
+        key = "up" if direction == "up" else "down"
+        result = {}
+        for symbol, entry in self.streaks().items():
+            if wanted is not None and symbol not in wanted:
+                continue
+            if len(entry["values"]) >= n and entry[key] >= n - 1:
+                result[symbol] = entry["values"][-n:]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ROI history store maintenance")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--before", help="compact months before YYYY-MM (default: current month)")
+    parser.add_argument("--dir", default=ROI_DIR)
+    args = parser.parse_args()
+
+    months = RoiStore(args.dir).compact(before=args.before)
+    print(f"Compacted months: {', '.join(months) if months else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,107 @@
 import os
+import time
 import pickle
-import requests
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
 import webbrowser
 from urllib.parse import urlparse, parse_qs
-from dotenv import load_dotenv
-from kiteconnect import KiteConnect, exceptions
+from .instrumentation import instrument_kite, timed
 
-# Load environment variables
-load_dotenv()
+if TYPE_CHECKING:
+    from kiteconnect import KiteConnect
 
-# Kite credentials
-KITE_API_KEY = os.getenv("KITE_API_KEY")
-KITE_API_SECRET = os.getenv("KITE_API_SECRET")
+# Credentials are read from the environment / .env by init_environment()
+KITE_API_KEY = None
+KITE_API_SECRET = None
 KITE_TOKEN_FILE = "auth/kite_access_token.pkl"
 
-# Upstox credentials
-UPSTOX_API_KEY = os.getenv("UPSTOX_API_KEY")
-UPSTOX_API_SECRET = os.getenv("UPSTOX_API_SECRET")
+UPSTOX_API_KEY = None
+UPSTOX_API_SECRET = None
 UPSTOX_REDIRECT_URI = "http://localhost"
+UPSTOX_API_BASE = os.getenv("UPSTOX_API_BASE", "https://api.upstox.com/v2")
 UPSTOX_TOKEN_FILE = "auth/upstox_access_token.pkl"
 
-# Ensure token directories exist
-os.makedirs(os.path.dirname(KITE_TOKEN_FILE), exist_ok=True)
-os.makedirs(os.path.dirname(UPSTOX_TOKEN_FILE), exist_ok=True)
+# Both brokers invalidate access tokens once a day at a fixed IST time
+IST = timezone(timedelta(hours=5, minutes=30))
+KITE_TOKEN_EXPIRY = (6, 0)
+UPSTOX_TOKEN_EXPIRY = (3, 30)
 
-def save_token(token: str, token_file: str):
+_initialized = False
+_init_lock = threading.Lock()
+
+class LoginRequired(RuntimeError):
+    """A broker login is needed but this session manager may not prompt for one."""
+
+
+# Interactive logins share the terminal, so only one prompts at a time across all accounts
+_prompt_lock = threading.Lock()
+
+
+def init_environment():
+    """
+    Load .env, read broker credentials and create the token directories.
+    Runs once per process; everything that needs a session calls it.
+    """
+    global _initialized, KITE_API_KEY, KITE_API_SECRET, UPSTOX_API_KEY, UPSTOX_API_SECRET, UPSTOX_API_BASE
+    with _init_lock:
+        if _initialized:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+
+        KITE_API_KEY = os.getenv("KITE_API_KEY")
+        KITE_API_SECRET = os.getenv("KITE_API_SECRET")
+        UPSTOX_API_KEY = os.getenv("UPSTOX_API_KEY")
+        UPSTOX_API_SECRET = os.getenv("UPSTOX_API_SECRET")
+        UPSTOX_API_BASE = os.getenv("UPSTOX_API_BASE", UPSTOX_API_BASE)
+
+        os.makedirs(os.path.dirname(KITE_TOKEN_FILE), exist_ok=True)
+        os.makedirs(os.path.dirname(UPSTOX_TOKEN_FILE), exist_ok=True)
+        _initialized = True
+
+
+def save_token(token: str, token_file: str, issued_at: float | None = None):
     with open(token_file, "wb") as f:
-        pickle.dump(token, f)
+        pickle.dump({"access_token": token, "issued_at": issued_at or time.time()}, f)
+
+def load_token_record(token_file: str) -> dict | None:
+    """
+    {"access_token", "issued_at"} from a token file. Files written before
+    issue times were recorded hold a bare token; their issued_at is None.
+    """
+    if not os.path.exists(token_file):
+        return None
+    with open(token_file, "rb") as f:
+        record = pickle.load(f)
+    if isinstance(record, str):
+        return {"access_token": record, "issued_at": None}
+    return record
 
 def load_token(token_file: str) -> str | None:
-    if os.path.exists(token_file):
-        with open(token_file, "rb") as f:
-            return pickle.load(f)
-    return None
+    record = load_token_record(token_file)
+    return record["access_token"] if record else None
+
+def token_expiry(issued_at: float, expiry=KITE_TOKEN_EXPIRY) -> float:
+    """Epoch time of the first daily (hour, minute) IST cut-off after issued_at."""
+    issued = datetime.fromtimestamp(issued_at, IST)
+    cutoff = issued.replace(hour=expiry[0], minute=expiry[1], second=0, microsecond=0)
+    if cutoff <= issued:
+        cutoff += timedelta(days=1)
+    return cutoff.timestamp()
+
+def is_token_fresh(record: dict | None, expiry) -> bool:
+    if not record or not record.get("access_token") or not record.get("issued_at"):
+        return False
+    return time.time() < token_expiry(record["issued_at"], expiry)
 
 # Kite token management
-def generate_new_kite_token(kite: KiteConnect) -> str:
+def generate_new_kite_token(kite: "KiteConnect", api_secret: str | None = None, token_file: str | None = None,
+                            account: str | None = None) -> str:
     login_url = kite.login_url()
+    if account:
+        print(f"👤 Logging in Kite account '{account}'")
     print(f"🔐 Login URL: {login_url}")
     webbrowser.open(login_url)
 
@@ -47,36 +112,19 @@ def generate_new_kite_token(kite: KiteConnect) -> str:
     if not request_token:
         raise ValueError("❌ Could not extract request_token from the URL.")
 
-    data = kite.generate_session(request_token, api_secret=KITE_API_SECRET)
+    data = kite.generate_session(request_token, api_secret=api_secret or KITE_API_SECRET)
     access_token = data["access_token"]
-    save_token(access_token, KITE_TOKEN_FILE)
+    save_token(access_token, token_file or KITE_TOKEN_FILE)
     print("✅ New Kite access token generated and saved.")
     return access_token
 
-def get_valid_kite_access_token(kite: KiteConnect) -> str:
-    access_token = load_token(KITE_TOKEN_FILE)
-    if access_token:
-        try:
-            kite.set_access_token(access_token)
-            kite.profile()
-            return access_token
-        except exceptions.TokenException:
-            print("⚠️ Kite access token expired.")
-        except Exception as e:
-            print(f"⚠️ Error validating Kite token: {e}")
-    print("🔁 Generating a new Kite access token...")
-    return generate_new_kite_token(kite)
-
-def get_kite_session() -> KiteConnect:
-    kite = KiteConnect(api_key=KITE_API_KEY)
-    access_token = get_valid_kite_access_token(kite)
-    kite.set_access_token(access_token)
-    return kite
+def get_kite_session() -> "KiteConnect":
+    return get_session_manager().kite()
 
 # Upstox token management
 def generate_new_upstox_token() -> str:
     login_url = (
-        f"https://api.upstox.com/v2/login/authorization/dialog?"
+        f"{UPSTOX_API_BASE}/login/authorization/dialog?"
         f"response_type=code&client_id={UPSTOX_API_KEY}&redirect_uri={UPSTOX_REDIRECT_URI}"
     )
     print("🔗 Opening Upstox login URL in your browser...")
@@ -93,7 +141,10 @@ def generate_new_upstox_token() -> str:
         "grant_type": "authorization_code"
     }
 
-    response = requests.post("https://api.upstox.com/v2/login/authorization/token", data=token_payload)
+    from .http_client import get_http_client
+    # The authorization code is single-use, so the exchange is never retried
+    response = get_http_client().post(f"{UPSTOX_API_BASE}/login/authorization/token",
+                                      endpoint="upstox:token", retries=0, data=token_payload)
     access_token = response.json().get("access_token")
 
     if access_token:
@@ -104,10 +155,169 @@ def generate_new_upstox_token() -> str:
         print("❌ Failed to retrieve Upstox access token.")
         return None
 
-def get_valid_upstox_access_token() -> str:
-    access_token = load_token(UPSTOX_TOKEN_FILE)
-    if access_token:
+def get_valid_upstox_access_token(interactive: bool = True) -> str:
+    return get_session_manager().upstox_token(interactive)
+
+def refresh_upstox_token(stale_token: str | None, interactive: bool = True) -> str:
+    return get_session_manager().refresh_upstox(stale_token, interactive)
+
+
+class SessionManager:
+    """
+    Process-wide broker sessions. Tokens are stored with their issue time,
+    and a token issued since the broker's last daily cut-off is used
+    without a validation call. Stale tokens are refreshed once under a
+    lock; concurrent callers wait and pick up the new token. Interactive
+    logins are serialized so two threads never prompt at the same time.
+    Extra Kite accounts get their own manager with a separate token file
+    (and optionally their own API key); see get_account_session(). Headless
+    callers set interactive = False, and a login that would prompt raises
+    LoginRequired instead.
+    """
+
+    def __init__(self, kite_token_file=None, kite_api_key=None, kite_api_secret=None, account=None):
+        self.kite_token_file = kite_token_file or KITE_TOKEN_FILE
+        self.kite_api_key = kite_api_key
+        self.kite_api_secret = kite_api_secret
+        self.account = account
+        self.interactive = True
+        self._kite_lock = threading.Lock()
+        self._upstox_lock = threading.Lock()
+        self._prompt_lock = _prompt_lock
+        self._kite = None
+        self._kite_record = None
+        self._upstox_record = None
+
+    def kite(self) -> "KiteConnect":
+        with self._kite_lock:
+            if self._kite is None or not is_token_fresh(self._kite_record, KITE_TOKEN_EXPIRY):
+                self._login_kite()
+            return self._kite
+
+    def _login_kite(self):
+        from kiteconnect import KiteConnect, exceptions
+        kite = self._kite or instrument_kite(KiteConnect(api_key=self.kite_api_key or KITE_API_KEY),
+                                             on_token_error=self._recover_kite)
+        # Another process may have logged in since this one did
+        record = load_token_record(self.kite_token_file)
+        if record and record["issued_at"] is None:
+            # Legacy token without an issue time: validate it once
+            try:
+                kite.set_access_token(record["access_token"])
+                # Straight to KiteConnect: a TokenException here is handled below, not by the proxy
+                with timed("kite:profile"):
+                    getattr(kite, "_kite", kite).profile()
+                record = {"access_token": record["access_token"], "issued_at": time.time()}
+                save_token(record["access_token"], self.kite_token_file, record["issued_at"])
+            except exceptions.TokenException:
+                print("⚠️ Kite access token expired.")
+                record = None
+            except Exception as e:
+                print(f"⚠️ Error validating Kite token: {e}")
+                record = None
+        if not is_token_fresh(record, KITE_TOKEN_EXPIRY):
+            if not self.interactive:
+                who = f" for account '{self.account}'" if self.account else ""
+                raise LoginRequired(f"Kite login required{who}; restart interactively to log in")
+            with self._prompt_lock:
+                print("🔁 Generating a new Kite access token...")
+                access_token = generate_new_kite_token(kite, self.kite_api_secret, self.kite_token_file, self.account)
+            record = {"access_token": access_token, "issued_at": time.time()}
+        kite.set_access_token(record["access_token"])
+        self._kite, self._kite_record = kite, record
+
+    def _drop_kite_token(self, rejected=None):
+        self._kite_record = None
+        record = load_token_record(self.kite_token_file)
+        # Keep a token another process saved after the rejected one
+        if record and (rejected is None or record["access_token"] == rejected):
+            os.remove(self.kite_token_file)
+
+    def invalidate_kite(self):
+        """Force a new login on the next kite() call."""
+        with self._kite_lock:
+            self._drop_kite_token()
+
+    def _recover_kite(self, rejected_token):
+        """
+        Called by the Kite proxy when Kite rejects rejected_token (revoked or
+        logged out elsewhere before its daily expiry): drop it and log in
+        again, once for all threads. Returns True when a new token is set.
+        """
+        with self._kite_lock:
+            if self._kite_record and self._kite_record["access_token"] != rejected_token:
+                return True
+            logging.warning("⚠️ Kite rejected the access token; logging in again.")
+            self._drop_kite_token(rejected_token)
+            self._login_kite()
+            return True
+
+    def upstox_token(self, interactive: bool = True) -> str:
+        """interactive=False raises LoginRequired rather than prompting, e.g. from a background thread."""
+        with self._upstox_lock:
+            record = self._upstox_record
+            if record is None or (record["issued_at"] is not None and not is_token_fresh(record, UPSTOX_TOKEN_EXPIRY)):
+                record = load_token_record(UPSTOX_TOKEN_FILE)
+            # Legacy tokens have no issue time; use them until Upstox rejects one
+            if record and (record["issued_at"] is None or is_token_fresh(record, UPSTOX_TOKEN_EXPIRY)):
+                self._upstox_record = record
+                return record["access_token"]
+            return self._login_upstox(interactive)
+
+    def refresh_upstox(self, stale_token: str | None, interactive: bool = True) -> str:
+        """Replace a rejected token, unless another caller already has."""
+        with self._upstox_lock:
+            if self._upstox_record and self._upstox_record["access_token"] != stale_token:
+                return self._upstox_record["access_token"]
+            logging.info("Invalid Upstox token detected. Regenerating token...")
+            return self._login_upstox(interactive)
+
+    def _login_upstox(self, interactive: bool = True) -> str:
+        if not (self.interactive and interactive):
+            raise LoginRequired("Upstox login required; restart interactively to log in")
+        with self._prompt_lock:
+            print("🔁 Generating a new Upstox access token...")
+            access_token = generate_new_upstox_token()
+        self._upstox_record = {"access_token": access_token, "issued_at": time.time()} if access_token else None
         return access_token
-    print("🔁 Generating a new Upstox access token...")
-    return generate_new_upstox_token()
 
+
+_session_manager = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> SessionManager:
+    global _session_manager
+    init_environment()
+    with _session_manager_lock:
+        if _session_manager is None:
+            _session_manager = SessionManager()
+        return _session_manager
+
+
+
+_account_sessions = {}
+
+
+def get_account_session(account: str, token_file: str | None = None, api_key: str | None = None,
+                        api_secret: str | None = None) -> SessionManager:
+    """
+    Session manager for one named Kite account. Tokens live in
+    auth/kite_access_token_<account>.pkl unless token_file is given;
+    credentials default to KITE_API_KEY_<ACCOUNT> / KITE_API_SECRET_<ACCOUNT>
+    and then to the main KITE_API_KEY / KITE_API_SECRET.
+    """
+    init_environment()
+    with _session_manager_lock:
+        manager = _account_sessions.get(account)
+        if manager is None:
+            suffix = account.upper().replace("-", "_")
+            manager = SessionManager(
+                kite_token_file=token_file or os.path.join(os.path.dirname(KITE_TOKEN_FILE),
+                                                           f"kite_access_token_{account}.pkl"),
+                kite_api_key=api_key or os.getenv(f"KITE_API_KEY_{suffix}"),
+                kite_api_secret=api_secret or os.getenv(f"KITE_API_SECRET_{suffix}"),
+                account=account,
+            )
+            _account_sessions[account] = manager
+        return manager
@@ -0,0 +1,133 @@
+import os
+import logging
+import threading
+import pandas as pd
+from .columnar import list_parts, read_part, write_part
+
+TRADEBOOK_DIR = "data/tradebook"
+LEGACY_TRADEBOOK_PATH = "data/zerodha-tradebook-master.csv"
+
+TRADE_COLUMNS = [
+    "symbol", "isin", "trade_date", "exchange", "segment", "series",
+    "trade_type", "auction", "quantity", "price", "trade_id", "order_id", "order_execution_time"
+]
+NUMERIC_COLUMNS = ("quantity", "price")
+
+
+def _normalize(df):
+    df = df.copy()
+    df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+    for col in TRADE_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    df = df[TRADE_COLUMNS]
+    df["symbol"] = df["symbol"].astype(str).str.replace("#", "").str.upper()
+    df["trade_type"] = df["trade_type"].astype(str).str.lower()
+    df["trade_date"] = pd.to_datetime(df["trade_date"], errors="coerce", format="mixed")
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in TRADE_COLUMNS:
+        if col not in NUMERIC_COLUMNS and col != "trade_date":
+            df[col] = df[col].fillna("").astype(str)
+    return df
+
+
+class TradebookStore:
+    """
+    Append-only tradebook, partitioned by trade month (trade_month=YYYY-MM).
+    New trades are written as new part files, never rewriting history. A
+    persistent trade_id index (one id per line) rejects duplicates, so the
+    legacy master CSV is simply re-imported whenever it changes on disk.
+    """
+
+    def __init__(self, directory=TRADEBOOK_DIR, legacy_path=LEGACY_TRADEBOOK_PATH):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "_trade_ids.txt")
+        self.legacy_marker_path = os.path.join(directory, "_legacy_import.txt")
+        self._lock = threading.Lock()
+        self._trade_ids = None
+        if legacy_path and os.path.exists(legacy_path):
+            self._import_legacy(legacy_path)
+
+    def _import_legacy(self, legacy_path):
+        """Import the legacy CSV if it changed since the last import; trades already stored are skipped."""
+        stat = os.stat(legacy_path)
+        version = f"{stat.st_mtime_ns} {stat.st_size}"
+        if os.path.exists(self.legacy_marker_path):
+            with open(self.legacy_marker_path) as f:
+                if f.read().strip() == version:
+                    return
+        logging.info(f"Importing {legacy_path} into {self.directory}")
+        legacy = pd.read_csv(legacy_path, dtype=str)
+        imported = self.append(legacy)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.legacy_marker_path, "w") as f:
+            f.write(version + "\n")
+        if imported:
+            print(f"Imported {imported} trades from {legacy_path} into the tradebook store.")
+
+    @property
+    def trade_ids(self):
+        if self._trade_ids is None:
+            self._trade_ids = set()
+            if os.path.exists(self.index_path):
+                with open(self.index_path) as f:
+                    self._trade_ids = {line.strip() for line in f if line.strip()}
+        return self._trade_ids
+
+    def append(self, trades_df):
+        """Append trades not already in the store; returns how many were added."""
+        if trades_df.empty:
+            return 0
+        df = _normalize(trades_df)
+        with self._lock:
+            df = df[~df["trade_id"].isin(self.trade_ids)]
+            df = df.drop_duplicates(subset="trade_id", keep="last")
+            if df.empty:
+                return 0
+
+            months = df["trade_date"].dt.strftime("%Y-%m").fillna("unknown")
+            for month, part in df.groupby(months):
+                write_part(part, os.path.join(self.directory, f"trade_month={month}"))
+
+            # Ids are recorded only after their partitions are on disk; a crash
+            # in between leaves duplicate rows that read() drops
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.index_path, "a") as f:
+                f.writelines(f"{trade_id}\n" for trade_id in df["trade_id"])
+            self.trade_ids.update(df["trade_id"])
+        return len(df)
+
+    def read(self, columns=None, symbols=None, trade_type=None):
+        """
+        Load trades, reading only the requested columns and symbols.
+        trade_type ("buy"/"sell") filters on the normalized lowercase value.
+        A trade_id found in more than one part (an append that crashed
+        before recording its ids) is returned once.
+        """
+        filters = []
+        if symbols is not None:
+            symbols = sorted({s.replace("#", "").upper() for s in symbols})
+            # pyarrow rejects an empty "in" list, and nothing could match anyway
+            if not symbols:
+                return pd.DataFrame(columns=columns or TRADE_COLUMNS)
+            filters.append(("symbol", "in", symbols))
+        if trade_type is not None:
+            filters.append(("trade_type", "in", [trade_type.lower()]))
+
+        read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ["trade_id"]))
+        frames = [read_part(path, columns=read_columns, filters=filters) for path in list_parts(self.directory)]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=columns or TRADE_COLUMNS)
+
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates(subset="trade_id", keep="first").reset_index(drop=True)
+        if columns is not None:
+            df = df[list(columns)]
+        if "trade_date" in df.columns:
+            df["trade_date"] = pd.to_datetime(df["trade_date"], errors="coerce")
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        return df
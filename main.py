@@ -1,4 +1,39 @@
-from core.gtt_menu import main as gtt_main
+import argparse
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="tradecraft GTT assistant")
+    parser.add_argument("--daemon", action="store_true",
+                        help="run plan -> reconcile -> place on a schedule instead of the menu")
+    parser.add_argument("--once", action="store_true", help="run a single headless cycle and exit")
+    parser.add_argument("--interval", type=float, default=5, help="minutes between daemon cycles")
+    parser.add_argument("--dry-run", action="store_true", help="plan and log GTT changes without placing them")
+    parser.add_argument("--reconcile", action="store_true", help="modify existing GTTs to match the plan")
+    parser.add_argument("--prune", action="store_true", help="delete BUY GTTs that are not in the plan")
+    parser.add_argument("--all-hours", action="store_true", help="run cycles outside market hours too")
+    parser.add_argument("--output", help="append per-cycle JSON lines to this file")
+    parser.add_argument("--cache-capacity", type=int,
+                        help="quotes kept in memory (default 5000; always grows to fit the tracked symbols)")
+    parser.add_argument("--accounts", nargs="?", const="data/accounts.csv", metavar="CSV",
+                        help="run headless for every account in this CSV (name,entry_levels,token_file)")
+    parser.add_argument("--account-workers", type=int, default=4, help="accounts planned and synced at once")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    gtt_main()
+    args = parse_args()
+    if args.accounts:
+        from core.accounts import MultiAccountDaemon, load_accounts
+        daemon = MultiAccountDaemon(load_accounts(args.accounts), dry_run=args.dry_run,
+                                    reconcile=args.reconcile or None, prune=args.prune,
+                                    account_workers=args.account_workers, output_path=args.output,
+                                    cache_capacity=args.cache_capacity)
+        daemon.run(interval=args.interval, once=args.once, market_hours_only=not args.all_hours)
+    elif args.daemon or args.once:
+        from core.daemon import GttDaemon
+        daemon = GttDaemon(dry_run=args.dry_run, reconcile=args.reconcile or None, prune=args.prune,
+                           output_path=args.output, cache_capacity=args.cache_capacity)
+        daemon.run(interval=args.interval, once=args.once, market_hours_only=not args.all_hours)
+    else:
+        from core.gtt_menu import main as gtt_main
+        gtt_main(dry_run=args.dry_run or None, cache_capacity=args.cache_capacity)